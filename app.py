@@ -1,18 +1,63 @@
 import streamlit as st
+import hashlib
 import os
-import json
-import google.generativeai as genai
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-# UPDATED IMPORTS for compatibility
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
+import threading
+import time
+from collections import deque
 
 # --- IMPORT THE RUNNER MODULE ---
-from runner import execute_selenium_code
+# Heavy dependencies (Gemini client, LangChain / FAISS, torch) are not imported here: the modules
+# below load them on first use, so the page renders before any of them is needed
+from runner import stream_selenium_code
+from prompts import test_plan_prompt, script_prompt, suite_prompt, repair_prompt
+from context_packing import RETRIEVAL_CANDIDATES, PAGE_ELEMENTS_SHARE, fit_page_elements, pack_context, remaining_tokens
+from generation import get_model, generate_scripts, strip_code_fences
+from llm_cache import get_llm_cache
+from suite_generation import SUITE_PAGE_FILE, generate_suites, group_by_feature
+from plan_generation import generate_test_plans, spec_features, stream_test_plan
+from suite_runner import run_suite
+from ledger import execute_with_ledger
+from preflight import preflight, format_diagnostics
+from tracing import span
+from knowledge_base import source_hash
+from kb_registry import corpus_key, get_kb_registry
+from backend_client import BACKEND_URLS, BackendError, get_backend_client
+
+
+# --- KNOWLEDGE BASES ---
+# Built indexes are shared read-only by every session through the process-wide registry;
+# the project index is only opened (from disk) when a corpus has to be built or updated
+def open_knowledge_base(project):
+    from embeddings import get_embedding_service
+    from knowledge_base import KnowledgeBase
+
+    with span("knowledge_base_load"):
+        return KnowledgeBase(project, get_embedding_service())
+
+
+def regenerating(action, *inputs):
+    """
+    True if this session already generated `action` for the same inputs: clicking the button
+    again asks for a new answer instead of the cached one (see llm_cache.CachedModel).
+    """
+    signature = hashlib.sha256(repr((action,) + inputs).encode("utf-8")).hexdigest()
+    generated = st.session_state.setdefault("generated_for", set())
+    repeat = signature in generated
+    generated.add(signature)
+    return repeat
+
+
+@st.cache_resource
+def knowledge_base_lock(project):
+    # Every build of a project syncs the same on-disk index and manifest: builds must take turns
+    return threading.Lock()
+
 
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Autonomous QA Agent", layout="wide")
+LIVE_LOG_LINES = 300  # Lines of console output shown while a test runs
+RUN_LOCAL = "This machine"
+RUN_REMOTE = f"Backend ({len(BACKEND_URLS)} instance{'s' if len(BACKEND_URLS) != 1 else ''}, QA_BACKEND_URLS)"
 
 # --- SESSION STATE INITIALIZATION ---
 if "vector_db" not in st.session_state:
@@ -21,6 +66,8 @@ if "test_cases" not in st.session_state:
     st.session_state.test_cases = []
 if "html_context" not in st.session_state:
     st.session_state.html_context = ""
+if "timings" not in st.session_state:
+    st.session_state.timings = {}  # phase -> milliseconds, for the most recent run of each phase
 
 # --- SIDEBAR: SETUP ---
 with st.sidebar:
@@ -29,10 +76,47 @@ with st.sidebar:
     api_key = st.text_input("Google Gemini API Key", type="password")
 
     if api_key:
+        # Read by generation.get_model when the Gemini client is first created
         os.environ["GOOGLE_API_KEY"] = api_key
-        genai.configure(api_key=api_key)
         st.success("Authentication Successful")
 
+    st.divider()
+    st.info("Step 2: Choose a Project")
+    project_name = st.text_input("Project Name", value="default",
+                                 help="Each project keeps its own knowledge base on disk.")
+
+    st.divider()
+    # Scripts run in-process unless backend instances are configured (see backend_client.py)
+    run_location = st.radio("Run tests on", [RUN_LOCAL, RUN_REMOTE] if BACKEND_URLS else [RUN_LOCAL])
+    remote = run_location == RUN_REMOTE
+
+    st.divider()
+    with st.expander("LLM Response Cache"):
+        cache_stats = get_llm_cache().stats()
+        st.caption(
+            f"{cache_stats['entries']} cached responses · {cache_stats['hits']} hits / "
+            f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+        if st.button("Clear Cache"):
+            get_llm_cache().clear()
+
+    with st.expander("Shared Knowledge Bases"):
+        # Not created just for this: that would load the embedding stack on every cold start
+        kb_registry = get_kb_registry(create=False)
+        kb_stats = kb_registry.stats() if kb_registry is not None else None
+        if kb_stats is None:
+            st.caption("No knowledge base loaded yet.")
+        else:
+            st.caption(
+                f"{kb_stats['loaded']} in memory ({kb_stats['bytes'] / 2 ** 20:.0f} / "
+                f"{kb_stats['budget_bytes'] / 2 ** 20:.0f} MB) · {kb_stats['leases']} open leases · "
+                f"{kb_stats['evictions']} evicted, {kb_stats['loads']} reloaded")
+
+    with st.expander("Timings (ms)"):
+        if st.session_state.timings:
+            st.table([{"phase": phase, "ms": ms} for phase, ms in st.session_state.timings.items()])
+        else:
+            st.caption("Nothing measured yet.")
+
     st.divider()
     st.markdown("### About")
     st.caption(
@@ -76,24 +160,48 @@ if st.button("Build Knowledge Base", type="primary"):
     else:
         with st.spinner("Parsing documents and creating embeddings..."):
             try:
-                # 1. Process Text Files
-                docs = []
-                for file in uploaded_files:
-                    text = file.read().decode("utf-8")
-                    docs.append(Document(page_content=text, metadata={"source": file.name}))
-
-                # 2. Chunking
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-                chunks = text_splitter.split_documents(docs)
-
-                # 3. Embeddings (Using HuggingFace - Local & Stable)
-                embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
-                # 4. Vector Store
-                st.session_state.vector_db = FAISS.from_documents(chunks, embeddings)
+                # 1. Uploads are streamed (decoded and chunked block by block), not read into memory
+                files = {file.name: file for file in uploaded_files}
+                registry = get_kb_registry()
+                key = corpus_key({name: source_hash(file) for name, file in files.items()},
+                                 registry.embeddings.model_name)
+
+                # 2. Same documents already indexed (by anyone)? Share that index
+                lease = registry.acquire(key)
+                if lease is not None:
+                    st.success(f"✅ Knowledge Base loaded! Shared index for these {len(files)} files "
+                               f"({len(lease.vector_db)} chunks).")
+                else:
+                    # 3. Incremental sync of the project's on-disk Vector Store (only new/changed chunks are embedded)
+                    ingest_progress = st.progress(0.0, text="Ingesting documents...")
+
+                    def show_progress(progress):
+                        eta = f", ~{progress['eta']:.0f}s left" if progress["eta"] is not None else ""
+                        ingest_progress.progress(
+                            progress["fraction"],
+                            text=f"{progress['bytes_done'] / 1e6:.1f} / {progress['bytes_total'] / 1e6:.1f} MB · "
+                                 f"{progress['chunks_added']} chunks embedded{eta}")
+
+                    with knowledge_base_lock(project_name):
+                        kb = open_knowledge_base(project_name)
+                        stats = kb.sync(files, on_progress=show_progress)
+                        lease = registry.register(key, kb.vector_db, kb.source_hashes())
+                    ingest_progress.empty()
+                    st.session_state.timings.update(stats["timings"])
+
+                    st.success(
+                        f"✅ Knowledge Base Built! {stats['total']} chunks from {len(uploaded_files)} files "
+                        f"({stats['added']} embedded, {stats['unchanged']} reused, {stats['deleted']} removed).")
+
+                # The previous corpus (if any) can now be evicted once no other session uses it
+                previous_lease = st.session_state.get("kb_lease")
+                st.session_state.kb_lease = lease
+                if previous_lease is not None and previous_lease is not lease:
+                    previous_lease.release()
+
+                st.session_state.vector_db = lease.vector_db
+                st.session_state.source_hashes = lease.source_hashes
                 st.session_state.html_context = html_content
-
-                st.success(f"✅ Knowledge Base Built! Processed {len(chunks)} chunks from {len(uploaded_files)} files.")
             except Exception as e:
                 st.error(f"Error building Knowledge Base: {e}")
 
@@ -105,6 +213,9 @@ st.markdown("### Phase 2: Test Case Generation Agent")
 # Example prompt for the user
 default_prompt = "Generate positive and negative test cases for the Discount Code feature."
 user_query = st.text_input("Agent Instruction:", value=default_prompt)
+# Searching only some documents skips the other shards of the index entirely
+source_filter = st.multiselect("Limit retrieval to sources (optional):",
+                               sorted(st.session_state.get("source_hashes") or {}))
 
 if st.button("Generate Test Cases"):
     if not st.session_state.vector_db:
@@ -112,60 +223,117 @@ if st.button("Generate Test Cases"):
     else:
         with st.spinner("🔍 Retrieving rules & generating test plan..."):
             try:
-                # 1. RAG Retrieval
-                retriever = st.session_state.vector_db.as_retriever(search_kwargs={"k": 3})
-                relevant_docs = retriever.invoke(user_query)
-                context_text = "\n\n".join(
-                    [f"[Source: {d.metadata.get('source', 'doc')}]: {d.page_content}" for d in relevant_docs])
-
-                # 2. LLM Prompting
-                # Corrected model name to ensure it works
-                model = genai.GenerativeModel('gemini-2.5-flash')
-
-                prompt = f"""
-                You are a Senior QA Automation Engineer.
-                Generate a structured test plan based **strictly** on the provided Documentation Context and HTML.
-
-                ---
-                DOCUMENTATION CONTEXT:
-                {context_text}
-                ---
-                TARGET HTML STRUCTURE:
-                {st.session_state.html_context[:1500]} 
-                ---
-                USER REQUEST: {user_query}
-                ---
-
-                INSTRUCTIONS:
-                1. Create comprehensive test cases (Positive & Negative).
-                2. Use 'Test_ID' like TC-001, TC-002.
-                3. 'Grounded_In' must reference the specific source file provided in context.
-                4. Output strictly valid JSON list format. No Markdown blocks.
-
-                JSON SCHEMA:
-                [
-                    {{
-                        "Test_ID": "TC-001",
-                        "Feature": "Discount Code",
-                        "Test_Scenario": "Enter valid code 'SAVE20'",
-                        "Expected_Result": "Total reduces by 20%",
-                        "Grounded_In": "product_specs.md"
-                    }}
-                ]
-                """
-
-                response = model.generate_content(prompt)
-
-                # 3. Parsing
-                clean_json = response.text.replace("```json", "").replace("```", "").strip()
-                test_cases = json.loads(clean_json)
+                # 1. RAG Retrieval (more candidates than fit; packing keeps the most relevant)
+                timings = {}
+                search_kwargs = {"k": RETRIEVAL_CANDIDATES}
+                if source_filter:
+                    search_kwargs["filter"] = {"source": source_filter}
+                with span("faiss_search", timings):
+                    docs_and_scores = st.session_state.vector_db.similarity_search_with_score(user_query,
+                                                                                             **search_kwargs)
+
+                # 2. Context packing within the phase's token budget, then LLM Prompting
+                page_elements = fit_page_elements(st.session_state.html_context, "test_plan",
+                                                  test_plan_prompt("", "", user_query),
+                                                  share=PAGE_ELEMENTS_SHARE, timings=timings)
+                context_budget = remaining_tokens("test_plan", test_plan_prompt("", page_elements, user_query))
+                context_text = pack_context(docs_and_scores, context_budget, timings, phase="test_plan")
+                model = get_model(refresh=regenerating("test_plan", user_query, source_filter,
+                                                       st.session_state.html_context))
+                prompt = test_plan_prompt(context_text, page_elements, user_query)
+
+                # 3. Streamed generation: each test case is validated and shown as soon as it is complete;
+                # broken items are reported without losing the others
+                test_cases, invalid = [], []
+                table = st.empty()
+                with span("test_plan_generation", timings) as attributes:
+                    started = time.perf_counter()
+                    for test_case, error in stream_test_plan(model, prompt):
+                        if error is not None:
+                            invalid.append(error)
+                            continue
+                        if not test_cases:
+                            attributes["first_item_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                            timings["test_plan_first_item"] = attributes["first_item_ms"]
+                        test_cases.append(test_case)
+                        table.table(test_cases)
+                    attributes.update(items=len(test_cases), invalid=len(invalid))
+                table.empty()
+                st.session_state.timings.update(timings)
 
                 st.session_state.test_cases = test_cases
                 st.success(f"Generated {len(test_cases)} test cases.")
+                if invalid:
+                    st.warning(f"{len(invalid)} malformed test cases were skipped.")
+                    with st.expander("Skipped items"):
+                        st.code("\n".join(invalid), language="text")
 
             except Exception as e:
                 st.error(f"Agent Error: {e}")
 
+# --- BATCH: ONE TEST PLAN COVERING MANY FEATURES ---
+with st.expander("📚 Generate a test plan for many features at once"):
+    if st.button("Suggest features from spec headings"):
+        if st.session_state.vector_db:
+            try:
+                st.session_state.batch_features = "\n".join(spec_features(st.session_state.vector_db))
+            except Exception as e:
+                st.error(f"Agent Error: {e}")
+        else:
+            st.error("⚠️ Knowledge Base not found. Please complete Phase 1.")
+    feature_text = st.text_area("Features (one per line):", key="batch_features", height=150)
+    plan_concurrency = st.slider("Parallel LLM calls", min_value=1, max_value=32, value=8, key="plan_concurrency")
+    plan_rpm = st.number_input("Rate limit (requests / minute)", min_value=1, value=60, key="plan_rpm")
+
+    if st.button("Generate Test Plans"):
+        features = [line for line in feature_text.splitlines() if line.strip()]
+        if not st.session_state.vector_db:
+            st.error("⚠️ Knowledge Base not found. Please complete Phase 1.")
+        elif not features:
+            st.error("⚠️ Enter at least one feature.")
+        else:
+            try:
+                progress = st.progress(0.0, text="Generating test plans...")
+                table = st.empty()
+                finished, rows = [], []
+
+                def show_plan(feature, test_cases, error):
+                    # Rows appear per feature as plans come in (IDs are renumbered once all are merged)
+                    finished.append(feature)
+                    progress.progress(len(finished) / len(features),
+                                      text=f"{len(finished)}/{len(features)} features done")
+                    if error:
+                        st.error(f"{feature}: {error}")
+                    else:
+                        rows.extend(test_cases)
+                        table.table(rows)
+
+                timings = {}
+                result = generate_test_plans(
+                    st.session_state.vector_db,
+                    features,
+                    st.session_state.html_context,
+                    filter={"source": source_filter} if source_filter else None,
+                    model=get_model(refresh=regenerating("test_plans", features, source_filter,
+                                                         st.session_state.html_context)),
+                    concurrency=plan_concurrency,
+                    requests_per_minute=plan_rpm,
+                    on_result=show_plan,
+                    timings=timings
+                )
+                table.empty()
+                st.session_state.timings.update(timings)
+                st.session_state.test_cases = result["test_cases"]
+                st.success(f"Generated {len(result['test_cases'])} test cases for {len(result['features'])} features "
+                           f"({result['duplicates']} duplicates merged).")
+                invalid = [error for report in result["features"].values() for error in report["invalid"]]
+                if invalid:
+                    st.warning(f"{len(invalid)} malformed test cases were skipped.")
+                    with st.expander("Skipped items"):
+                        st.code("\n".join(invalid), language="text")
+            except Exception as e:
+                st.error(f"Agent Error: {e}")
+
 # Display Results
 if st.session_state.test_cases:
     st.table(st.session_state.test_cases)
@@ -185,51 +353,243 @@ if st.session_state.test_cases:
 
         with st.spinner("💻 Writing Python Selenium Code..."):
             try:
-                model = genai.GenerativeModel('gemini-2.5-flash')
-
-                script_prompt = f"""
-                You are a Python Selenium Expert.
-                Write a complete, runnable Python script for the following test case.
-
-                TEST CASE:
-                {json.dumps(selected_case)}
-
-                TARGET HTML:
-                {st.session_state.html_context}
-
-                STRICT REQUIREMENTS:
-                1. Use `webdriver.Chrome()`.
-                2. Initialize the driver normally (NOT headless) and maximize the window.
-                3. Add `import time` at the top.
-                4. Add `time.sleep(2)` immediately after `driver.get()`.  <-- ADD THIS
-                5. Add `time.sleep(1)` BEFORE every `.click()` or `.send_keys()` action. <-- ADD THIS
-                6. Use exact ID/Class selectors found in the HTML.
-                7. Include assertions to verify the `Expected_Result`.
-                8. Return ONLY the Python code (no markdown formatting).
-                """
+                timings = {}
+                model = get_model(refresh=regenerating("script", selected_case, st.session_state.html_context))
+                page_elements = fit_page_elements(st.session_state.html_context, "script",
+                                                  script_prompt(selected_case, ""), timings=timings)
+                prompt = script_prompt(selected_case, page_elements)
 
-                resp = model.generate_content(script_prompt)
-                code = resp.text.replace("```python", "").replace("```", "").strip()
+                with span("script_generation", timings):
+                    resp = model.generate_content(prompt)
+                st.session_state.timings.update(timings)
+                code = strip_code_fences(resp.text)
 
                 # Save to session state
                 st.session_state.generated_code = code
+                st.session_state.generated_case = selected_case
                 st.success("Script Generated Successfully!")
 
             except Exception as e:
                 st.error(f"Script Generation Error: {e}")
 
+    # --- BATCH: GENERATE SCRIPTS FOR THE WHOLE PLAN ---
+    with st.expander(f"⚡ Generate scripts for all {len(st.session_state.test_cases)} test cases"):
+        concurrency = st.slider("Parallel LLM calls", min_value=1, max_value=32, value=8)
+        rpm = st.number_input("Rate limit (requests / minute)", min_value=1, value=60)
+
+        if st.button("Generate All Scripts"):
+            st.session_state.generated_scripts = {}
+            try:
+                progress = st.progress(0.0, text="Generating scripts...")
+                results_area = st.container()
+                total = len(st.session_state.test_cases)
+
+                def show_result(test_case, code, error):
+                    # Called as each script completes, so results stream in
+                    st.session_state.generated_scripts[test_case["Test_ID"]] = code
+                    done = len(st.session_state.generated_scripts)
+                    progress.progress(done / total, text=f"{done}/{total} scripts generated")
+                    with results_area.expander(f"{test_case['Test_ID']}: {test_case['Test_Scenario']}"):
+                        if error:
+                            st.error(f"Script Generation Error: {error}")
+                        else:
+                            st.code(code, language="python")
+
+                # One element index for every prompt, sized for the longest test case
+                page_elements = fit_page_elements(st.session_state.html_context, "script",
+                                                  *[script_prompt(tc, "") for tc in st.session_state.test_cases])
+                generate_scripts(
+                    st.session_state.test_cases,
+                    page_elements,
+                    model=get_model(refresh=regenerating("scripts", st.session_state.test_cases,
+                                                         st.session_state.html_context)),
+                    concurrency=concurrency,
+                    requests_per_minute=rpm,
+                    on_result=show_result
+                )
+                failed = sum(1 for code in st.session_state.generated_scripts.values() if code is None)
+                if failed:
+                    st.warning(f"{total - failed} scripts generated, {failed} failed.")
+                else:
+                    st.success(f"All {total} scripts generated.")
+            except Exception as e:
+                st.error(f"Script Generation Error: {e}")
+
+        scripts = {test_id: code for test_id, code in st.session_state.get("generated_scripts", {}).items() if code}
+        if scripts and st.button(f"Run All {len(scripts)} Scripts (headless, fast pacing)"):
+            with st.spinner("Running scripts..."):
+                try:
+                    if remote:
+                        # One request per backend instance; they run the scripts on their own workers
+                        batch = get_backend_client().execute_batch(scripts, executor="pooled", pacing="fast",
+                                                                   html=st.session_state.html_context)
+                        summary = batch["summary"]
+                        rows = [{"Test_ID": test_id, "status": result["status"],
+                                 "duration": round(result.get("timings", {}).get("total", 0) / 1000, 3)}
+                                for test_id, result in batch["results"].items()]
+                    else:
+                        report = run_suite([{"name": test_id, "code": code} for test_id, code in scripts.items()],
+                                           executor="pooled", pacing="fast", target_html=st.session_state.html_context)
+                        summary = report["summary"]
+                        rows = [{"Test_ID": test["name"], "status": test["status"], "duration": test["duration"]}
+                                for test in report["tests"]]
+                    st.info(f"{summary['passed']}/{summary['total']} passed in {summary['wall_time']:.1f}s")
+                    st.table(rows)
+                except BackendError as e:
+                    st.error(f"Backend Error: {e}")
+                except Exception as e:
+                    st.error(f"Execution Error: {e}")
+
+    # --- SUITE MODE: ONE PYTEST MODULE PER FEATURE ---
+    with st.expander("🧪 Generate one pytest suite per feature (shared browser & page)"):
+        if st.button("Generate Feature Suites"):
+            st.session_state.generated_suites = {}
+            try:
+                with st.spinner("Writing pytest suites..."):
+                    page_elements = fit_page_elements(
+                        st.session_state.html_context, "suite",
+                        *[suite_prompt(feature, cases, "")
+                          for feature, cases in group_by_feature(st.session_state.test_cases).items()])
+                    results = generate_suites(
+                        st.session_state.test_cases,
+                        page_elements,
+                        model=get_model(refresh=regenerating("suites", st.session_state.test_cases,
+                                                             st.session_state.html_context))
+                    )
+                for module, suite in results.items():
+                    if suite["error"]:
+                        st.error(f"{module}: {suite['error']}")
+                    else:
+                        st.session_state.generated_suites[module] = suite["code"]
+            except Exception as e:
+                st.error(f"Suite Generation Error: {e}")
+
+        for module, code in st.session_state.get("generated_suites", {}).items():
+            st.markdown(f"**{module}**")
+            st.code(code, language="python")
+            st.download_button(f"Download {module}", code, file_name=module, key=f"download_{module}")
+        if st.session_state.get("generated_suites"):
+            # One copy of the page for every module, saved next to them for standalone runs
+            st.download_button(f"Download {SUITE_PAGE_FILE} (save it next to the suites)",
+                               st.session_state.html_context, file_name=SUITE_PAGE_FILE, key="download_suite_page")
+
+        if st.session_state.get("generated_suites") and st.button("Run Feature Suites"):
+            try:
+                with st.spinner("Running suites..."):
+                    report = run_suite(
+                        [{"name": module, "code": code} for module, code in st.session_state.generated_suites.items()],
+                        executor="subprocess",
+                        pacing="demo",
+                        target_html=st.session_state.html_context
+                    )
+                summary = report["summary"]
+                st.info(f"{summary['passed']}/{summary['total']} suites passed in {summary['wall_time']:.1f}s")
+                st.table([{key: test[key] for key in ("name", "status", "duration")} for test in report["tests"]])
+            except Exception as e:
+                st.error(f"Suite Error: {e}")
+
     # --- EXECUTION SECTION ---
     if "generated_code" in st.session_state:
         st.subheader("Generated Python Script")
         st.code(st.session_state.generated_code, language="python")
 
+        # Static pre-flight check: catches broken scripts before a browser is launched
+        check = preflight(st.session_state.generated_code, st.session_state.html_context)
+        if check["ok"]:
+            resolved = sum(1 for locator in check["locators"] if locator.get("matches"))
+            st.caption(f"✅ Pre-flight passed in {check['elapsed_ms']} ms "
+                       f"({resolved} of {len(check['locators'])} locators resolved against the target HTML).")
+            if check["diagnostics"]:
+                st.code(format_diagnostics(check["diagnostics"]), language="text")
+        else:
+            st.warning("⚠️ Pre-flight check failed. The script would be rejected without running.")
+            st.code(format_diagnostics(check["diagnostics"]), language="text")
+            if st.button("🔁 Regenerate with diagnostics"):
+                with st.spinner("💻 Fixing the script..."):
+                    try:
+                        diagnostics_text = format_diagnostics(check["diagnostics"])
+                        page_elements = fit_page_elements(
+                            st.session_state.html_context, "repair",
+                            repair_prompt(st.session_state.generated_code, diagnostics_text, ""))
+                        prompt = repair_prompt(st.session_state.generated_code, diagnostics_text, page_elements)
+                        resp = get_model().generate_content(prompt)
+                        st.session_state.generated_code = strip_code_fences(resp.text)
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Script Generation Error: {e}")
+
         st.markdown("---")
         st.subheader("🚀 Execute Test(It can run only in your pc -- Not supported on streamlit)")
 
+        executor_label = st.radio(
+            "Browser Mode",
+            ["Visible (new browser per run)", "Fast (warm headless pool)"],
+            horizontal=True
+        )
+        executor = "pooled" if executor_label.startswith("Fast") else "subprocess"
+
+        pacing_label = st.radio(
+            "Pacing",
+            ["Demo (keep sleeps)", "Fast (explicit waits only)"],
+            horizontal=True
+        )
+        pacing = "fast" if pacing_label.startswith("Fast") else "demo"
+
+        only_affected = st.checkbox(
+            "Only run if the script, the page or its grounded specs changed since the last pass",
+            value=True
+        )
+
         if st.button("Run Simulation Now"):
             with st.spinner("Running Selenium Test..."):
-                # Call the runner function
-                result = execute_selenium_code(st.session_state.generated_code)
+                def stream_locally(code, **run_options):
+                    # Stream the console output while the test runs
+                    live_log = st.empty()
+                    shown = deque(maxlen=LIVE_LOG_LINES)
+                    last_render = 0.0
+                    result = None
+
+                    for event in stream_selenium_code(code, target_html=st.session_state.html_context,
+                                                      **run_options):
+                        if event["type"] == "result":
+                            result = event["result"]
+                            break
+                        shown.append(event["line"])
+                        # Re-render at most ~10x per second
+                        if time.monotonic() - last_render > 0.1:
+                            live_log.code("".join(shown), language="text")
+                            last_render = time.monotonic()
+                    live_log.empty()
+                    return result
+
+                def execute_remotely(code, **run_options):
+                    # Runs on a backend instance; the console output comes back with the result
+                    return get_backend_client().execute(code, html=st.session_state.html_context, **run_options)
+
+                test_case = st.session_state.get("generated_case", {})
+                try:
+                    result = execute_with_ledger(
+                        st.session_state.generated_code,
+                        st.session_state.html_context,
+                        test_case.get("Grounded_In"),
+                        st.session_state.get("source_hashes", {}),
+                        only_affected=only_affected,
+                        test_id=test_case.get("Test_ID"),
+                        execute=execute_remotely if remote else stream_locally,
+                        executor=executor,
+                        pacing=pacing
+                    )
+                except BackendError as e:
+                    result = {"success": False, "status": "error", "output": "", "error": f"Backend Error: {e}"}
+                except Exception as e:
+                    # E.g. the ledger database could not be read or written
+                    result = {"success": False, "status": "error", "output": "", "error": f"System Error: {e}"}
+
+                if result.get("skipped"):
+                    st.info(f"⏭️ Skipped: nothing changed since the passing run of "
+                            f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(result['cached_at']))}.")
+                st.session_state.timings.update(
+                    {f"run.{phase}": ms for phase, ms in result.get("timings", {}).items()})
 
                 if result["success"]:
                     st.success("✅ Test Passed Successfully!")
@@ -1,55 +1,328 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import subprocess
-import sys
+import json
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+from runner import execute_selenium_code, stream_selenium_code, DEFAULT_TIMEOUT, EXECUTORS, PACINGS
+from jobs import JobQueue, QueueFullError, MAX_TIMEOUT
+from tracing import registry
+import suite_runner
+
+# Each running suite drives up to DEFAULT_WORKERS browsers of its own, next to the job queue's
+MAX_RUNNING_SUITES = int(os.environ.get("QA_MAX_RUNNING_SUITES", "1"))
+MAX_FINISHED_SUITES = int(os.environ.get("QA_SUITE_HISTORY", "100"))
+
+job_queue = JobQueue()
+suite_runs = OrderedDict()  # suite_id -> {"suite_id", "status", "scripts", "options", "report"}
+suite_slots = threading.BoundedSemaphore(MAX_RUNNING_SUITES)
+suites_lock = threading.Lock()
+
+registry.gauge("qa_job_queue_depth", "Jobs waiting for a worker.", lambda: job_queue.stats()["queue_depth"])
+registry.gauge("qa_jobs_running", "Jobs currently executing.", lambda: job_queue.stats()["running"])
+HTTP_SECONDS = registry.histogram("qa_http_request_duration_seconds", "Time to produce an HTTP response.")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    job_queue.start()
+    yield
+    job_queue.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/jobs/{job_id}), not by raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                         path=getattr(route, "path", "unmatched"), status=response.status_code)
+    return response
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus metrics: phase histograms, LLM token counts, queue depth and in-flight runs.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 # Define the data model for the request
 class ScriptRequest(BaseModel):
     code: str
+    timeout: int = DEFAULT_TIMEOUT
+    executor: Optional[str] = None  # "subprocess" or "pooled"; defaults to QA_EXECUTOR
+    pacing: Optional[str] = None  # "demo" or "fast"; defaults to QA_PACING
+    html: Optional[str] = None  # Target page, served to the script as QA_TARGET_URL
+    preflight: Optional[bool] = None  # Static check before running; defaults to "when html is given"
+
+
+def _run_options(request):
+    """
+    Validates and returns the execution options shared by /execute and /jobs.
+    """
+    if request.executor is not None and request.executor not in EXECUTORS:
+        raise HTTPException(status_code=422, detail=f"executor must be one of {list(EXECUTORS)}")
+    if request.pacing is not None and request.pacing not in PACINGS:
+        raise HTTPException(status_code=422, detail=f"pacing must be one of {list(PACINGS)}")
+    return {"executor": request.executor, "pacing": request.pacing, "target_html": request.html,
+            "run_preflight": request.preflight}
+
+
+def _timeout(request):
+    """
+    The request's timeout, capped at MAX_TIMEOUT like the job queue's (a blocking /execute call
+    holds a browser and a server thread for as long as the script runs).
+    """
+    return min(request.timeout, MAX_TIMEOUT)
 
 
 @app.post("/execute")
 def execute_script(request: ScriptRequest):
     """
     Receives Python code, saves it, executes it, and returns the output.
+    Blocks until the script finishes; prefer POST /jobs for anything non-trivial.
+    """
+    return execute_selenium_code(request.code, timeout=_timeout(request), **_run_options(request))
+
+
+@app.post("/execute/stream")
+def execute_script_stream(request: ScriptRequest):
+    """
+    Same as /execute, but streams the output as server-sent events while the script runs:
+    `stdout` / `stderr` events carry {"line": ...}, a final `result` event carries the result.
+    """
+    options = _run_options(request)
+
+    def events():
+        for event in stream_selenium_code(request.code, timeout=_timeout(request), **options):
+            payload = event["result"] if event["type"] == "result" else {"line": event["line"]}
+            yield f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+class BatchRequest(BaseModel):
+    scripts: Dict[str, str]  # name -> code
+    timeout: int = DEFAULT_TIMEOUT
+    executor: Optional[str] = None
+    pacing: Optional[str] = None
+    html: Optional[str] = None  # Shared target page for every script
+    preflight: Optional[bool] = None
+
+
+@app.post("/execute/batch")
+def execute_batch(request: BatchRequest):
+    """
+    Runs many scripts with the same settings and returns every result at once.
+    The scripts go through the job queue, so they share its workers with /jobs; the batch is
+    rejected as a whole (429) when the queue cannot take all of it.
     """
-    filename = "generated_test_script.py"
+    if not request.scripts:
+        raise HTTPException(status_code=422, detail="scripts must not be empty")
+    options = _run_options(request)
 
+    started = time.monotonic()
+    jobs = {}
     try:
-        # 1. Save the code to a file
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(request.code)
-
-        # 2. Run the file as a subprocess
-        result = subprocess.run(
-            [sys.executable, filename],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-
-        # 3. Return the results
-        return {
-            "success": result.returncode == 0,
-            "output": result.stdout,
-            "error": result.stderr
-        }
-
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "output": "",
-            "error": "Error: The test timed out (took longer than 60 seconds)."
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "output": "",
-            "error": f"System Error: {str(e)}"
-        }
-
-# To run this: uvicorn backend:app --reload
\ No newline at end of file
+        for name, code in request.scripts.items():
+            jobs[name] = job_queue.submit(code, timeout=request.timeout, **options)
+    except QueueFullError as e:
+        for job in jobs.values():
+            job_queue.cancel(job.id)
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+
+    results = {}
+    for name, job in jobs.items():
+        job.wait()
+        results[name] = job.result
+    passed = sum(1 for result in results.values() if result["success"])
+    return {
+        "summary": {"total": len(results), "passed": passed, "failed": len(results) - passed,
+                    "wall_time": round(time.monotonic() - started, 3)},
+        "results": results,
+    }
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: ScriptRequest):
+    """
+    Queues a script for execution and returns immediately with a job id.
+    Returns 429 when the queue is full.
+    """
+    options = _run_options(request)
+    try:
+        job = job_queue.submit(request.code, timeout=request.timeout, **options)
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Returns the job status, plus the execution result once it has finished.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """
+    Cancels a queued job, or kills it if it is already running.
+    """
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs")
+def queue_stats():
+    """
+    Returns worker, queue-depth and in-flight counters.
+    """
+    return job_queue.stats()
+
+
+# --- SUITES ---
+class SuiteRequest(BaseModel):
+    scripts: Dict[str, str]  # name -> code
+    workers: int = suite_runner.DEFAULT_WORKERS
+    executor: str = "pooled"
+    pacing: str = "fast"
+    timeout: int = DEFAULT_TIMEOUT
+
+
+def _suites_busy():
+    return JSONResponse(status_code=429, headers={"Retry-After": "30"},
+                        content={"detail": f"{MAX_RUNNING_SUITES} suite(s) already running."})
+
+
+def _trim_suites():
+    # Called with suites_lock held: forget the oldest finished runs beyond MAX_FINISHED_SUITES
+    finished = [suite_id for suite_id, run in suite_runs.items() if run["status"] in ("finished", "error")]
+    for suite_id in finished[:max(0, len(finished) - MAX_FINISHED_SUITES)]:
+        del suite_runs[suite_id]
+
+
+def _start_suite(run, rerun=False):
+    """
+    Starts the run in the background if a suite slot is free (see MAX_RUNNING_SUITES).
+    Returns False, without starting it, if all slots are taken.
+    """
+    if not suite_slots.acquire(blocking=False):
+        return False
+
+    def work():
+        try:
+            if rerun:
+                run["report"] = suite_runner.rerun_failed(run["report"], run["scripts"], **run["options"])
+            else:
+                run["report"] = suite_runner.run_suite(run["scripts"], **run["options"])
+            run["status"] = "finished"
+        except Exception as e:
+            run["status"] = "error"
+            run["error"] = f"System Error: {str(e)}"
+        finally:
+            suite_slots.release()
+            with suites_lock:
+                _trim_suites()
+
+    run["status"] = "running"
+    threading.Thread(target=work, name=f"suite-{run['suite_id']}", daemon=True).start()
+    return True
+
+
+def _get_suite(suite_id):
+    with suites_lock:
+        run = suite_runs.get(suite_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Suite not found")
+    return run
+
+
+def _suite_view(run):
+    return {key: value for key, value in run.items() if key != "scripts"}
+
+
+@app.post("/suites", status_code=202)
+def submit_suite(request: SuiteRequest):
+    """
+    Runs many scripts as one sharded suite in the background (see suite_runner.py).
+    Returns 429 when QA_MAX_RUNNING_SUITES suites are already running.
+    """
+    if request.executor not in EXECUTORS:
+        raise HTTPException(status_code=422, detail=f"executor must be one of {list(EXECUTORS)}")
+    if request.pacing not in PACINGS:
+        raise HTTPException(status_code=422, detail=f"pacing must be one of {list(PACINGS)}")
+
+    suite_id = uuid.uuid4().hex
+    run = {
+        "suite_id": suite_id,
+        "status": "queued",
+        "scripts": [{"name": name, "code": code} for name, code in request.scripts.items()],
+        "options": {
+            "workers": max(1, min(request.workers, suite_runner.DEFAULT_WORKERS)),
+            "executor": request.executor,
+            "pacing": request.pacing,
+            "timeout": _timeout(request),
+        },
+        "report": None,
+    }
+    if not _start_suite(run):
+        return _suites_busy()
+    with suites_lock:
+        suite_runs[suite_id] = run
+        _trim_suites()
+    return _suite_view(run)
+
+
+@app.get("/suites/{suite_id}")
+def get_suite(suite_id: str):
+    """
+    Returns the suite status and, once finished, its JSON report.
+    """
+    return _suite_view(_get_suite(suite_id))
+
+
+@app.get("/suites/{suite_id}/junit")
+def get_suite_junit(suite_id: str):
+    """
+    Returns the finished suite's report as JUnit XML.
+    """
+    run = _get_suite(suite_id)
+    if run["report"] is None:
+        raise HTTPException(status_code=409, detail="Suite has not finished yet")
+    return Response(content=suite_runner.to_junit_xml(run["report"]), media_type="application/xml")
+
+
+@app.post("/suites/{suite_id}/rerun", status_code=202)
+def rerun_suite(suite_id: str):
+    """
+    Re-runs only the failed tests of a finished suite and merges the results.
+    """
+    run = _get_suite(suite_id)
+    if run["status"] != "finished":
+        raise HTTPException(status_code=409, detail="Suite has not finished yet")
+    if not _start_suite(run, rerun=True):
+        return _suites_busy()
+    return _suite_view(run)
+
+# To run this: uvicorn backend:app --reload
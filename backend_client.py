@@ -0,0 +1,161 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from runner import DEFAULT_TIMEOUT
+
+# Comma-separated base URLs of backend instances (`uvicorn backend:app`); none = run in-process
+BACKEND_URLS = [url.strip().rstrip("/") for url in os.environ.get("QA_BACKEND_URLS", "").split(",") if url.strip()]
+CONNECT_TIMEOUT = float(os.environ.get("QA_BACKEND_CONNECT_TIMEOUT", "3"))
+# Added to the scripts' own timeout to get the read timeout (queueing, browser start, transfer)
+READ_TIMEOUT_MARGIN = float(os.environ.get("QA_BACKEND_READ_MARGIN", "30"))
+RETRIES = int(os.environ.get("QA_BACKEND_RETRIES", "3"))
+POOL_SIZE = int(os.environ.get("QA_BACKEND_POOL_SIZE", "16"))  # Keep-alive connections per instance
+BACKOFF = 0.5  # Seconds; doubled on every retry
+
+
+class BackendError(Exception):
+    """Raised when a backend request fails (read timeout, error response, ...)."""
+
+
+class BackendUnavailableError(BackendError):
+    """Raised when no backend instance could take the request."""
+
+
+class BackendClient:
+    """
+    HTTP client for one or more backend instances (see backend.py).
+
+    - One requests.Session, so connections are kept alive and pooled (POOL_SIZE per instance).
+    - Failed connections and 429 / 503 answers (the request was not processed) are retried with
+      backoff. A lost response (read timeout) is not retried, as the script may have run.
+    - Requests go round-robin to the instances; one that cannot be reached is skipped.
+    - Batches are split across the instances and sent in parallel.
+    - Every failure is raised as a BackendError (BackendUnavailableError if no instance answered).
+    """
+
+    def __init__(self, urls=None, connect_timeout=CONNECT_TIMEOUT, retries=RETRIES, pool_size=POOL_SIZE):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.urls = list(urls or BACKEND_URLS)
+        if not self.urls:
+            raise ValueError("No backend URLs given (set QA_BACKEND_URLS)")
+        self.connect_timeout = connect_timeout
+        self._requests = requests
+
+        retry = Retry(total=retries, connect=retries, read=False, status=retries, backoff_factor=BACKOFF,
+                      status_forcelist=(429, 503), allowed_methods=None, respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=len(self.urls), pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _instances(self, first=None):
+        """
+        Instance URLs in the order to try them: round-robin, or starting from `first`.
+        """
+        if first is None:
+            with self._lock:
+                first = next(self._next) % len(self.urls)
+        return self.urls[first:] + self.urls[:first]
+
+    def _request(self, method, path, read_timeout, instances=None, **kwargs):
+        failures = []
+        for url in instances or self._instances():
+            try:
+                response = self.session.request(method, url + path, timeout=(self.connect_timeout, read_timeout),
+                                                **kwargs)
+            except (self._requests.ConnectionError, self._requests.exceptions.RetryError) as e:
+                failures.append(f"{url}: {e}")
+                continue
+            except self._requests.RequestException as e:
+                # E.g. a read timeout: the instance may have run the script, so no other one is tried
+                raise BackendError(f"{url}: {e}") from e
+            if response.status_code in (429, 503):
+                failures.append(f"{url}: busy ({response.status_code})")
+                continue
+            try:
+                response.raise_for_status()
+                return response.json()
+            except (self._requests.RequestException, ValueError) as e:
+                raise BackendError(f"{url}: {e}") from e
+        raise BackendUnavailableError("No backend instance could take the request: " + "; ".join(failures))
+
+    # --- PUBLIC API ---
+    def execute(self, code, timeout=DEFAULT_TIMEOUT, executor=None, pacing=None, html=None, preflight=None):
+        """
+        Runs one script on a backend instance (POST /execute) and returns its result
+        (same dictionary as runner.execute_selenium_code).
+        """
+        payload = {"code": code, "timeout": timeout, "executor": executor, "pacing": pacing, "html": html,
+                   "preflight": preflight}
+        return self._request("POST", "/execute", timeout + READ_TIMEOUT_MARGIN, json=payload)
+
+    def execute_batch(self, scripts, timeout=DEFAULT_TIMEOUT, executor=None, pacing=None, html=None,
+                      preflight=None):
+        """
+        Runs {name: code} with shared settings (POST /execute/batch), split across the instances.
+        Returns {"summary": {"total", "passed", "failed", "wall_time"}, "results": {name: result}}.
+        """
+        names = list(scripts)
+        shards = [names[index::len(self.urls)] for index in range(min(len(self.urls), len(names)))]
+        started = time.monotonic()
+
+        def send(index):
+            shard = {name: scripts[name] for name in shards[index]}
+            payload = {"scripts": shard, "timeout": timeout, "executor": executor, "pacing": pacing, "html": html,
+                       "preflight": preflight}
+            # Worst case the instance runs the shard one script at a time
+            return self._request("POST", "/execute/batch", timeout * len(shard) + READ_TIMEOUT_MARGIN,
+                                 instances=self._instances(index), json=payload)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(shards))) as threads:
+            for response in threads.map(send, range(len(shards))):
+                results.update(response["results"])
+
+        passed = sum(1 for result in results.values() if result["success"])
+        return {
+            "summary": {"total": len(results), "passed": passed, "failed": len(results) - passed,
+                        "wall_time": round(time.monotonic() - started, 3)},
+            "results": {name: results[name] for name in names},
+        }
+
+    def stats(self):
+        """
+        Returns {url: queue stats (GET /jobs) or {"error": ...}} for every instance.
+        """
+        stats = {}
+        for url in self.urls:
+            try:
+                stats[url] = self._request("GET", "/jobs", self.connect_timeout, instances=[url])
+            except BackendError as e:
+                stats[url] = {"error": str(e)}
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_backend_client():
+    """
+    Returns the shared BackendClient for QA_BACKEND_URLS, or None if no backend is configured.
+    """
+    global _client
+    if _client is None and BACKEND_URLS:
+        with _client_lock:
+            if _client is None:
+                _client = BackendClient()
+    return _client
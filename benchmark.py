@@ -0,0 +1,489 @@
+import argparse
+import ast
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# The whole benchmark runs offline: deterministic stub LLM, no response cache
+os.environ.setdefault("QA_LLM_BACKEND", "stub")
+os.environ.setdefault("QA_LLM_CACHE_ENABLED", "0")
+
+from context_packing import (RETRIEVAL_CANDIDATES, PAGE_ELEMENTS_SHARE, count_tokens, fit_page_elements,
+                             pack_context, remaining_tokens)
+from generation import get_model, generate_scripts
+from knowledge_base import KnowledgeBase
+from plan_generation import stream_test_plan
+from prompts import script_prompt, test_plan_prompt
+from runner import execute_selenium_code
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_FILES = ("product_specs.md", "ui_ux_guide.txt")
+TARGET_HTML_FILE = "checkout.html"
+
+BASELINE_PATH = os.environ.get("QA_BENCH_BASELINE", os.path.join(".benchmarks", "baseline.json"))
+TOLERANCE = float(os.environ.get("QA_BENCH_TOLERANCE", "0.25"))  # Allowed drift vs. the baseline
+# Differences smaller than this are timer noise, whatever the relative change
+NOISE_FLOOR = {"ms": 1.0, "s": 0.01}
+
+QUERIES = [
+    "Generate all positive and negative test cases for the discount code feature",
+    "What happens when the email address is invalid?",
+    "Express shipping cost and total price update",
+    "Colour of success and error messages",
+    "Payment button behaviour after a successful checkout",
+]
+
+STUB_SCRIPT = "print('benchmark')\n"
+
+# Heavy dependencies each phase of the app loads on first use (after the cold start)
+FIRST_USE_IMPORTS = {
+    "knowledge_base": ["langchain_community.vectorstores.faiss", "langchain_text_splitters"],
+    "gemini_client": ["google.generativeai"],
+    "embedding_model": ["langchain_huggingface"],
+}
+
+# Visits the target page in a local headless Chrome and exercises the discount form
+BROWSER_SCRIPT = """
+import os
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+
+options = Options()
+options.add_argument("--headless=new")
+if os.environ.get("QA_BROWSER_PROFILE_DIR"):
+    options.add_argument("--user-data-dir=" + os.environ["QA_BROWSER_PROFILE_DIR"])
+driver = webdriver.Chrome(options=options)
+try:
+    driver.get(os.environ["QA_TARGET_URL"])
+    driver.find_element(By.ID, "promo_code").send_keys("SAVE20")
+    driver.find_element(By.ID, "apply_btn").click()
+    assert driver.find_element(By.ID, "total-price").text == "840"
+finally:
+    driver.quit()
+"""
+
+
+# --- HELPERS ---
+def percentile(values, q):
+    """
+    Nearest-rank percentile (q in 0..100) of a non-empty list.
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def metric(value, unit, better="lower"):
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+def load_fixtures():
+    files = {}
+    for name in CORPUS_FILES:
+        with open(os.path.join(BASE_DIR, name), "r", encoding="utf-8") as f:
+            files[name] = f.read()
+    with open(os.path.join(BASE_DIR, TARGET_HTML_FILE), "r", encoding="utf-8") as f:
+        html = f.read()
+    return files, html
+
+
+def synthetic_corpus(files, scale):
+    """
+    The bundled documents repeated `scale` times under distinct source names
+    (so every copy produces its own chunks).
+    """
+    corpus = {}
+    for copy in range(scale):
+        for name, text in files.items():
+            source = name if copy == 0 else f"synthetic_{copy:04d}_{name}"
+            corpus[source] = text if copy == 0 else f"[Revision {copy}]\n{text}"
+    return corpus
+
+
+def make_embeddings(kind):
+    """
+    "fake": hash-seeded vectors (measures chunking + FAISS, not the model);
+    "real": the shared HuggingFace EmbeddingService.
+    """
+    if kind == "real":
+        from embeddings import get_embedding_service
+        return get_embedding_service()
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    return DeterministicFakeEmbedding(size=384)
+
+
+def app_imports():
+    """
+    Modules app.py imports at the top, i.e. what every cold start pays for before the page renders.
+    """
+    with open(os.path.join(BASE_DIR, "app.py"), "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return [module for module in modules if importlib.util.find_spec(module.split(".")[0]) is not None]
+
+
+def time_imports(modules, preload=()):
+    """
+    Seconds a fresh interpreter needs to import `modules` (after importing `preload`, untimed).
+    """
+    code = (
+        "import time, warnings\n"
+        "warnings.simplefilter('ignore')\n"
+        + "".join(f"import {module}\n" for module in preload)
+        + "started = time.perf_counter()\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + "print(time.perf_counter() - started)\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed")
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def import_report(modules, top=15):
+    """
+    The `top` slowest imports (cumulative microseconds) behind `modules`, from `python -X importtime`.
+    """
+    code = "import warnings; warnings.simplefilter('ignore')\n" + "".join(f"import {m}\n" for m in modules)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BASE_DIR,
+                               capture_output=True, text=True)
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        entries.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return sorted(entries, key=lambda entry: entry["cumulative_us"], reverse=True)[:top]
+
+
+# --- STAGES ---
+def bench_cold_start(rounds):
+    """
+    Import cost of the app's cold start and of each phase's first interaction, in fresh interpreters.
+    """
+    preload = app_imports()
+    metrics = {"cold_start.app_imports_ms": metric(
+        statistics.median(time_imports(preload) for _ in range(rounds)) * 1000, "ms")}
+    for phase, modules in FIRST_USE_IMPORTS.items():
+        try:
+            seconds = statistics.median(time_imports(modules, preload) for _ in range(rounds))
+        except RuntimeError as e:
+            print(f"  ! first use of {phase} not measured: {e}", file=sys.stderr)
+            continue
+        metrics[f"first_use.{phase}_ms"] = metric(seconds * 1000, "ms")
+    return metrics
+
+
+def bench_ingestion(files, embeddings, scales, workdir):
+    metrics = {}
+    largest = None
+    # FAISS, the splitter and the embedding model load on first use: load them before the clock
+    # starts, so the first scale measures ingestion and not import time (the cold-start stage's job)
+    import faiss  # noqa: F401
+    from langchain_community.vectorstores import FAISS  # noqa: F401
+    from langchain_core.documents import Document  # noqa: F401
+    from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: F401
+    embeddings.embed_query("warm-up")
+    for scale in scales:
+        corpus = synthetic_corpus(files, scale)
+        kb = KnowledgeBase(f"bench_x{scale}", embeddings, root=workdir)
+        started = time.perf_counter()
+        stats = kb.sync(corpus)
+        elapsed = time.perf_counter() - started
+        metrics[f"ingestion.x{scale}.chunks"] = metric(stats["added"], "chunks", better="none")
+        metrics[f"ingestion.x{scale}.chunks_per_s"] = metric(stats["added"] / elapsed if elapsed else 0.0,
+                                                             "chunks/s", better="higher")
+
+        # A second sync of the same corpus should be (almost) free
+        started = time.perf_counter()
+        kb.sync(corpus)
+        metrics[f"ingestion.x{scale}.resync_ms"] = metric((time.perf_counter() - started) * 1000, "ms")
+        largest = kb
+    return metrics, largest
+
+
+def resident_anon_mb():
+    """
+    Anonymous resident memory of this process in MB (Linux only, else None). Memory-mapped index
+    pages are file-backed, so they are not counted: the OS can drop them under pressure.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# Opens a ShardedIndex in a fresh interpreter (so freed build memory is not reused) and prints
+# the anonymous memory it added and what memory_bytes() reports
+INDEX_MEMORY_PROBE = """
+import json, sys
+import numpy as np
+from benchmark import resident_anon_mb
+from vector_index import ShardedIndex, _faiss
+_faiss()
+before = resident_anon_mb()
+index = ShardedIndex(sys.argv[1], None)
+index.similarity_search_with_score_by_vector(np.zeros(int(sys.argv[2]), dtype="float32"), k=4)
+print(json.dumps({"resident_mb": resident_anon_mb() - before, "reported_mb": index.memory_bytes() / 2 ** 20}))
+"""
+
+
+def bench_index_memory(workdir, dim=128):
+    """
+    Resident memory of an opened (memory-mapped) ShardedIndex, per index type, next to what
+    memory_bytes() reports for the knowledge base registry's budget.
+    """
+    import numpy as np
+    from vector_index import FLAT_MAX, ShardedIndex
+
+    if resident_anon_mb() is None:
+        print("  ! index memory not measured: /proc/self/status is not available", file=sys.stderr)
+        return {}
+    metrics = {}
+    for kind, count in (("flat", FLAT_MAX), ("hnsw", 2 * FLAT_MAX), ("ivfpq", 2 * FLAT_MAX)):
+        path = os.path.join(workdir, f"index_{kind}")
+        vectors = np.random.default_rng(0).random((count, dim), dtype="float32")
+        names = [str(position) for position in range(count)]
+        ShardedIndex.write(path, names, vectors, [{} for _ in names], names, kind=kind)
+
+        completed = subprocess.run([sys.executable, "-c", INDEX_MEMORY_PROBE, path, str(dim)], cwd=BASE_DIR,
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"  ! {kind} index memory not measured: {completed.stderr.strip()[-300:]}", file=sys.stderr)
+            continue
+        probe = json.loads(completed.stdout)
+        metrics[f"index.{kind}.resident_mb"] = metric(probe["resident_mb"], "MB")
+        metrics[f"index.{kind}.reported_mb"] = metric(probe["reported_mb"], "MB", better="none")
+    return metrics
+
+
+def bench_retrieval(kb, rounds):
+    latencies = []
+    retriever = kb.vector_db.as_retriever(search_kwargs={"k": 3})
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            retriever.invoke(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "retrieval.p50_ms": metric(percentile(latencies, 50), "ms"),
+        "retrieval.p95_ms": metric(percentile(latencies, 95), "ms"),
+        "retrieval.p99_ms": metric(percentile(latencies, 99), "ms"),
+    }
+
+
+def bench_prompts(kb, html):
+    # Same packing as the app's Phase 2 / Phase 3
+    docs_and_scores = kb.vector_db.similarity_search_with_score(QUERIES[0], k=RETRIEVAL_CANDIDATES)
+    page_elements = fit_page_elements(html, "test_plan", test_plan_prompt("", "", QUERIES[0]),
+                                      share=PAGE_ELEMENTS_SHARE)
+    context_text = pack_context(docs_and_scores,
+                                remaining_tokens("test_plan", test_plan_prompt("", page_elements, QUERIES[0])))
+    plan_prompt = test_plan_prompt(context_text, page_elements, QUERIES[0])
+
+    model = get_model(backend="stub", cached=False)
+    started = time.perf_counter()
+    # Streamed and parsed item by item, like the app
+    test_cases = [test_case for test_case, error in stream_test_plan(model, plan_prompt) if error is None]
+    plan_ms = (time.perf_counter() - started) * 1000
+
+    script_elements = fit_page_elements(html, "script", *[script_prompt(tc, "") for tc in test_cases])
+    first_script_prompt = script_prompt(test_cases[0], script_elements)
+    started = time.perf_counter()
+    generate_scripts(test_cases, script_elements, model=model, requests_per_minute=60000)
+    scripts_ms = (time.perf_counter() - started) * 1000
+
+    # Token counts come from the local counter (context_packing.count_tokens)
+    return {
+        "prompt.dom_index_chars": metric(len(page_elements), "chars"),
+        "prompt.test_plan_chars": metric(len(plan_prompt), "chars"),
+        "prompt.test_plan_tokens_est": metric(count_tokens(plan_prompt), "tokens"),
+        "prompt.script_chars": metric(len(first_script_prompt), "chars"),
+        "prompt.script_tokens_est": metric(count_tokens(first_script_prompt), "tokens"),
+        "generation.stub_plan_ms": metric(plan_ms, "ms"),
+        "generation.stub_scripts_ms": metric(scripts_ms, "ms"),
+    }
+
+
+def bench_execution(html, rounds, browser):
+    metrics = {}
+    cases = [("subprocess", STUB_SCRIPT, None)]
+    if browser:
+        cases += [("browser_subprocess", BROWSER_SCRIPT, "subprocess"), ("browser_pooled", BROWSER_SCRIPT, "pooled")]
+
+    for name, code, executor in cases:
+        durations = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            result = execute_selenium_code(code, executor=executor or "subprocess", pacing="fast",
+                                           target_html=html if executor else None)
+            durations.append(time.perf_counter() - started)
+            if not result["success"]:
+                print(f"  ! {name} run failed ({result['status']}): {result['error'].strip()[-300:]}",
+                      file=sys.stderr)
+                durations = []
+                break
+        if durations:
+            metrics[f"execution.{name}.median_s"] = metric(statistics.median(durations), "s")
+    return metrics
+
+
+def bench_api(requests_count, concurrency):
+    """
+    POST /execute throughput through the real FastAPI app (in-process ASGI client).
+    """
+    from fastapi.testclient import TestClient
+    import backend
+
+    latencies = []
+
+    def call(client):
+        started = time.perf_counter()
+        response = client.post("/execute", json={"code": STUB_SCRIPT, "executor": "subprocess"})
+        latencies.append((time.perf_counter() - started) * 1000)
+        return response.status_code == 200 and response.json()["success"]
+
+    with TestClient(backend.app) as client:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            ok = list(pool.map(lambda _: call(client), range(requests_count)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        f"api.execute.c{concurrency}.requests_per_s": metric(requests_count / elapsed, "req/s", better="higher"),
+        f"api.execute.c{concurrency}.p50_ms": metric(percentile(latencies, 50), "ms"),
+        f"api.execute.c{concurrency}.p95_ms": metric(percentile(latencies, 95), "ms"),
+        f"api.execute.c{concurrency}.error_rate": metric(1 - sum(ok) / len(ok), "ratio"),
+    }
+
+
+# --- BASELINES ---
+def compare(metrics, baseline, tolerance=TOLERANCE):
+    """
+    Returns the metrics that got worse than the baseline by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for name, current in metrics.items():
+        previous = baseline.get(name)
+        if previous is None or current["better"] == "none" or not previous["value"]:
+            continue
+        if abs(current["value"] - previous["value"]) < NOISE_FLOOR.get(current["unit"], 0.0):
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        worse = change > tolerance if current["better"] == "lower" else change < -tolerance
+        if worse:
+            regressions.append({"metric": name, "baseline": previous["value"], "current": current["value"],
+                                "change": round(change, 3), "unit": current["unit"]})
+    return regressions
+
+
+def run_benchmarks(scales=(1, 10, 50), retrieval_rounds=20, execution_rounds=3, api_requests=32,
+                   api_concurrency=8, browser=True, embeddings="fake", import_rounds=3):
+    """
+    Runs every stage and returns {metric name: {"value", "unit", "better"}}.
+    """
+    files, html = load_fixtures()
+    workdir = tempfile.mkdtemp(prefix="qa_bench_")
+    print("Cold start imports...", flush=True)
+    metrics = bench_cold_start(import_rounds)
+    try:
+        print("Ingestion...", flush=True)
+        stage, kb = bench_ingestion(files, make_embeddings(embeddings), scales, workdir)
+        metrics.update(stage)
+        print("Index memory...", flush=True)
+        metrics.update(bench_index_memory(workdir))
+        print("Retrieval...", flush=True)
+        metrics.update(bench_retrieval(kb, retrieval_rounds))
+        print("Prompts...", flush=True)
+        metrics.update(bench_prompts(kb, html))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("Execution...", flush=True)
+    metrics.update(bench_execution(html, execution_rounds, browser))
+    print("/execute throughput...", flush=True)
+    metrics.update(bench_api(api_requests, api_concurrency))
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the QA agent pipeline.")
+    parser.add_argument("--scales", default="1,10,50", help="Synthetic corpus sizes (copies of the bundled docs)")
+    parser.add_argument("--retrieval-rounds", type=int, default=20)
+    parser.add_argument("--execution-rounds", type=int, default=3)
+    parser.add_argument("--api-requests", type=int, default=32)
+    parser.add_argument("--api-concurrency", type=int, default=8)
+    parser.add_argument("--no-browser", action="store_true", help="Skip the headless Chrome runs")
+    parser.add_argument("--embeddings", choices=("fake", "real"), default="fake")
+    parser.add_argument("--import-rounds", type=int, default=3)
+    parser.add_argument("--import-report", action="store_true",
+                        help="Also list the slowest imports behind the app's cold start")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--json", dest="json_path", help="Where to write this run's metrics")
+    args = parser.parse_args(argv)
+
+    metrics = run_benchmarks(
+        scales=[int(scale) for scale in args.scales.split(",")],
+        retrieval_rounds=args.retrieval_rounds,
+        execution_rounds=args.execution_rounds,
+        api_requests=args.api_requests,
+        api_concurrency=args.api_concurrency,
+        browser=not args.no_browser,
+        embeddings=args.embeddings,
+        import_rounds=args.import_rounds,
+    )
+
+    if args.import_report:
+        print("\nSlowest imports at cold start (cumulative):")
+        for entry in import_report(app_imports()):
+            print(f"{entry['module']:<45} {entry['cumulative_us'] / 1000:>10.1f} ms")
+
+    print()
+    for name, current in metrics.items():
+        print(f"{name:<45} {current['value']:>12} {current['unit']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(metrics, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                  f"{regression['unit']} ({regression['change']:+.0%})")
+        if not regressions:
+            print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    if args.save_baseline:
+        if os.path.dirname(args.baseline):
+            os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import functools
+import math
+import os
+import re
+
+from dom_index import dom_index
+from knowledge_base import CHUNK_OVERLAP
+from tracing import span
+
+# Token budget of the whole prompt (instructions included) for each generation phase
+PHASE_BUDGETS = {
+    "test_plan": int(os.environ.get("QA_TEST_PLAN_PROMPT_TOKENS", "3000")),
+    "script": int(os.environ.get("QA_SCRIPT_PROMPT_TOKENS", "2500")),
+    "suite": int(os.environ.get("QA_SUITE_PROMPT_TOKENS", "4000")),
+    "repair": int(os.environ.get("QA_REPAIR_PROMPT_TOKENS", "4000")),
+}
+# Share of the budget actually filled: headroom for the difference between our count and the model's
+FILL_TARGET = float(os.environ.get("QA_CONTEXT_FILL_TARGET", "0.95"))
+# Phase 2: chunks retrieved before packing (the budget decides how many are used)
+RETRIEVAL_CANDIDATES = int(os.environ.get("QA_RETRIEVAL_CANDIDATES", "8"))
+# Phase 2: at most this share of the space left by the instructions goes to the page elements
+PAGE_ELEMENTS_SHARE = 0.5
+# A chunk that does not fit is cut to the remaining space, if at least this many tokens are left
+MIN_PARTIAL_TOKENS = 48
+# Overlaps shorter than this are treated as coincidence, not as splitter overlap
+MIN_OVERLAP_CHARS = 16
+
+# Texts up to this size (chunks, element lines) have their token count cached
+CACHED_TEXT_CHARS = 2000
+
+# Optional: a HuggingFace tokenizer.json (e.g. Gemma's) for exact counts, needs `tokenizers`
+TOKENIZER_FILE = os.environ.get("QA_TOKENIZER_FILE")
+
+_PIECES = re.compile(r"[A-Za-z]+|\d|\s+|([^\w\s])\1*|\w")
+
+
+@functools.lru_cache(maxsize=1)
+def _tokenizer():
+    if not TOKENIZER_FILE:
+        return None
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        return None
+    return Tokenizer.from_file(TOKENIZER_FILE)
+
+
+def _approximate_tokens(text):
+    # Sub-word tokenizers: a word is one token per ~7 letters, digits are one token each,
+    # a single space joins the next token, runs of the same symbol merge
+    count = 0
+    for match in _PIECES.finditer(text):
+        piece = match.group()
+        if piece[0].isalpha() and piece.isascii():
+            count += math.ceil(len(piece) / 7)
+        elif piece.isspace():
+            count += piece != " "
+        elif match.group(1):
+            count += 1 + (len(piece) - 1) // 4
+        else:
+            count += 1
+    return count
+
+
+def _count(text):
+    tokenizer = _tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return _approximate_tokens(text)
+
+
+_count_cached = functools.lru_cache(maxsize=4096)(_count)
+
+
+def count_tokens(text):
+    """
+    Local token count of `text`: exact with QA_TOKENIZER_FILE, otherwise a tokenizer-shaped
+    approximation that errs on the high side. No API call either way.
+    """
+    if not text:
+        return 0
+    return _count_cached(text) if len(text) <= CACHED_TEXT_CHARS else _count(text)
+
+
+def remaining_tokens(phase, base_prompt):
+    """
+    Tokens left for context in `phase` once `base_prompt` (the prompt without it) is counted.
+    """
+    return max(0, int(PHASE_BUDGETS[phase] * FILL_TARGET) - count_tokens(base_prompt))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Longest prefix of `text`, cut at a word boundary, within `max_tokens`.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text.rfind(" ", 0, low)
+    return text[:cut if cut > low // 2 else low].rstrip()
+
+
+def _overlap(previous, text, limit=CHUNK_OVERLAP * 2):
+    """
+    Length of the longest end of `previous` that `text` starts with (the splitter's chunk overlap).
+    """
+    for size in range(min(limit, len(previous), len(text)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return size
+    return 0
+
+
+def _dedupe(candidates):
+    """
+    Drops chunks already contained in a more relevant one and cuts the text a chunk shares with
+    its neighbour in the same source. Returns [(source, text)] in relevance order and the stats.
+    """
+    kept = []
+    duplicates = trimmed = 0
+    for source, text in candidates:
+        normalized = " ".join(text.split())
+        if any(normalized in " ".join(other.split()) for _, other in kept):
+            duplicates += 1
+            continue
+        for other_source, other in kept:
+            if other_source != source:
+                continue
+            # Either chunk may come first in the file
+            size = _overlap(other, text)
+            if size:
+                text = text[size:].lstrip()
+                trimmed += size
+            size = _overlap(text, other)
+            if size:
+                text = text[:-size].rstrip()
+                trimmed += size
+        if text.strip():
+            kept.append((source, text))
+        else:
+            duplicates += 1
+    return kept, duplicates, trimmed
+
+
+def pack_context(docs_and_scores, max_tokens, timings=None, phase=""):
+    """
+    Renders retrieved chunks like format_context(), most relevant first, within `max_tokens`.
+    `docs_and_scores` are (Document, distance) pairs, as returned by similarity_search_with_score.
+    Overlapping and duplicate chunks are merged; the first chunk that does not fit is cut to the
+    remaining space. Records a "context_packing" span with the token counts.
+    """
+    with span("context_packing", timings, phase=phase, budget=max_tokens) as attributes:
+        ordered = sorted(docs_and_scores, key=lambda pair: pair[1])
+        candidates = [(doc.metadata.get("source", "doc"), doc.page_content) for doc, _ in ordered]
+        chunks, duplicates, trimmed = _dedupe(candidates)
+
+        blocks, used, truncated = [], 0, False
+        for source, text in chunks:
+            block = f"[Source: {source}]: {text}"
+            cost = count_tokens(block) + (1 if blocks else 0)  # "\n\n" separator
+            if used + cost <= max_tokens:
+                blocks.append(block)
+                used += cost
+                continue
+            left = max_tokens - used - (1 if blocks else 0)
+            if left >= MIN_PARTIAL_TOKENS:
+                blocks.append(truncate_to_tokens(block, left))
+                truncated = True
+            break
+
+        context_text = "\n\n".join(blocks)
+        attributes.update(tokens=count_tokens(context_text), candidates=len(candidates),
+                          kept=len(blocks), duplicates=duplicates, overlap_chars_trimmed=trimmed,
+                          truncated=truncated)
+    return context_text
+
+
+def fit_page_elements(html, phase, *base_prompts, share=1.0, timings=None):
+    """
+    Page element index for `html`, sized to `share` of what is left of the phase budget once the
+    longest of `base_prompts` (the prompt rendered without page elements) is counted.
+    """
+    base_tokens = max(count_tokens(prompt) for prompt in base_prompts)
+    available = max(0, int(PHASE_BUDGETS[phase] * FILL_TARGET) - base_tokens)
+    with span("page_elements_packing", timings, phase=phase) as attributes:
+        page_elements = dom_index(html, max_tokens=int(available * share))
+        attributes.update(budget=int(available * share), tokens=count_tokens(page_elements))
+    return page_elements
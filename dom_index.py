@@ -0,0 +1,196 @@
+import functools
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+# Upper bound for the text handed to the LLM, whatever the size of the page
+MAX_INDEX_CHARS = int(os.environ.get("QA_DOM_INDEX_MAX_CHARS", "6000"))
+# Room reserved at the end of the index for the note on elements that did not fit
+NOTE_CHARS = 120
+NOTE_TOKENS = 90
+# Local copies of target pages, opened by generated scripts (the prompts no longer carry the HTML)
+PAGES_DIR = os.environ.get("QA_PAGES_DIR", os.path.join(tempfile.gettempdir(), "qa_pages"))
+
+INTERACTIVE_TAGS = {"input", "button", "select", "textarea", "a", "form", "option"}
+INTERACTIVE_ROLES = {"button", "link", "checkbox", "radio", "textbox", "combobox", "tab", "menuitem"}
+ATTRIBUTES = ("name", "type", "value", "placeholder", "href", "role", "aria-label")
+MAX_TEXT = 40
+
+
+def _short(text, limit=MAX_TEXT):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _labels(soup):
+    """
+    Maps element ids to the text of their <label for="..."> (or wrapping <label>).
+    """
+    labels = {}
+    for label in soup.find_all("label"):
+        text = _short(label.get_text(" ", strip=True))
+        target = label.get("for")
+        if not target:
+            control = label.find(["input", "select", "textarea"])
+            target = control.get("id") if control else None
+        if target and text:
+            labels.setdefault(target, text)
+    return labels
+
+
+def _is_interactive(tag):
+    return (
+        tag.name in INTERACTIVE_TAGS
+        or tag.get("role") in INTERACTIVE_ROLES
+        or any(attr.startswith("on") for attr in tag.attrs)
+        or tag.get("contenteditable") is not None
+    )
+
+
+def build_dom_index(html):
+    """
+    Extracts the elements a test can target from an HTML page.
+    Returns a list of dictionaries (document order) with:
+    - tag, id, classes, label, text, attrs (name/type/placeholder/...), handlers (inline on* code)
+    - interactive: Whether a user can act on the element (inputs, buttons, links, handlers, ...)
+    Only elements that are interactive or carry an id are kept.
+    """
+    from bs4 import BeautifulSoup
+    return _extract(BeautifulSoup(html, "html.parser"))
+
+
+def _extract(soup):
+    labels = _labels(soup)
+    elements = []
+
+    for tag in soup.find_all(True):
+        if tag.name in ("script", "style", "head", "meta", "link", "title"):
+            continue
+        interactive = _is_interactive(tag)
+        element_id = tag.get("id")
+        if not interactive and not element_id:
+            continue
+
+        # Only leaf-ish text (e.g. a span's price); containers would repeat their children
+        text = ""
+        if not tag.find(True) or tag.name in ("button", "a", "label", "option"):
+            text = _short(tag.get_text(" ", strip=True))
+
+        elements.append({
+            "tag": tag.name,
+            "id": element_id,
+            "classes": tag.get("class", []),
+            "label": labels.get(element_id) or "",
+            "text": text,
+            "attrs": {attr: tag.get(attr) for attr in ATTRIBUTES if tag.get(attr)},
+            "handlers": {attr: _short(tag[attr], 60) for attr in tag.attrs if attr.startswith("on")},
+            "interactive": interactive,
+        })
+
+    return elements
+
+
+def _format_element(element):
+    selector = element["tag"]
+    if element["id"]:
+        selector += f"#{element['id']}"
+    for css_class in element["classes"]:
+        selector += f".{css_class}"
+
+    parts = [selector]
+    parts += [f'{attr}="{_short(str(value))}"' for attr, value in element["attrs"].items()]
+    if element["label"]:
+        parts.append(f'label="{element["label"]}"')
+    if element["text"]:
+        parts.append(f'text="{element["text"]}"')
+    parts += [f'{attr}="{code}"' for attr, code in element["handlers"].items()]
+    return " ".join(parts)
+
+
+def _count_tokens(text):
+    # context_packing imports this module
+    from context_packing import count_tokens
+    return count_tokens(text)
+
+
+def _omission_note(omitted, max_chars=NOTE_CHARS, max_tokens=None):
+    """
+    "... N more elements not shown (ids: a, b)" within `max_chars` (and `max_tokens`). Ids that
+    do not fit are counted instead ("ids: a, b and 5 more"), so none of them goes unmentioned.
+    """
+    note = f"\n... {len(omitted)} more elements not shown"
+    ids = [element["id"] for element in omitted if element["id"]]
+    if not ids:
+        return note
+    for listed in range(len(ids), 0, -1):
+        rest = f" and {len(ids) - listed} more" if listed < len(ids) else ""
+        text = f"{note} (ids: {', '.join(ids[:listed])}{rest})"
+        if len(text) <= max_chars and (max_tokens is None or _count_tokens(text) <= max_tokens):
+            return text
+    return f"{note} ({len(ids)} of them with ids)"
+
+
+def page_file_url(html):
+    """
+    Writes `html` to a content-addressed file in PAGES_DIR (once) and returns its file:// URL.
+    """
+    body = html.encode("utf-8")
+    path = Path(PAGES_DIR, hashlib.sha256(body).hexdigest()[:16] + ".html").resolve()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        temporary.write_bytes(body)
+        os.replace(temporary, path)
+    return path.as_uri()
+
+
+def format_dom_index(elements, title="", url="", max_chars=MAX_INDEX_CHARS, max_tokens=None):
+    """
+    Renders the index as one line per element, within `max_chars` (and `max_tokens`, if given).
+    Interactive elements are kept first; anything that does not fit is reported
+    explicitly at the end (with its ids, or their count), never dropped silently.
+    """
+    header = f"PAGE: {title}\n" if title else ""
+    if url:
+        header += f"URL: {url}\n"
+    lines = [(index, _format_element(element)) for index, element in enumerate(elements)]
+
+    if max_tokens is not None:
+        token_budget = max_tokens - _count_tokens(header) - NOTE_TOKENS
+
+    # Fill the budget by priority, then restore document order
+    priority = sorted(lines, key=lambda line: (not elements[line[0]]["interactive"], line[0]))
+    budget = max_chars - len(header) - NOTE_CHARS
+    kept, omitted = [], []
+    for index, line in priority:
+        tokens = _count_tokens(line) + 1 if max_tokens is not None else 0
+        if budget - len(line) - 1 >= 0 and (max_tokens is None or token_budget - tokens >= 0):
+            kept.append((index, line))
+            budget -= len(line) + 1
+            if max_tokens is not None:
+                token_budget -= tokens
+        else:
+            omitted.append(elements[index])
+
+    text = header + "\n".join(line for _, line in sorted(kept))
+    if omitted:
+        text += _omission_note(omitted, max_tokens=NOTE_TOKENS if max_tokens is not None else None)
+    return text
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_index(html, url, max_chars, max_tokens):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    return format_dom_index(_extract(soup), title=title, url=url, max_chars=max_chars, max_tokens=max_tokens)
+
+
+def dom_index(html, max_chars=MAX_INDEX_CHARS, max_tokens=None):
+    """
+    Cached, prompt-ready element index for `html` (see build_dom_index / format_dom_index).
+    Its header carries the URL of a local copy of the page (see page_file_url) for scripts to open.
+    Only the index text is cached: the copy is re-written on every call if it has been cleaned up.
+    """
+    return _cached_index(html, page_file_url(html), max_chars, max_tokens)
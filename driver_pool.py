@@ -0,0 +1,339 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+
+from runner import (DEFAULT_TIMEOUT, MAX_LINE_LENGTH, MAX_OUTPUT_LINES, SCRIPT_NAME, OutputBuffer, run_workspace,
+                    workspace_env)
+from tracing import span, observe
+
+POOL_SIZE = int(os.environ.get("QA_POOL_SIZE", str(os.cpu_count() or 2)))
+MAX_USES = int(os.environ.get("QA_POOL_MAX_USES", "50"))
+STARTUP_TIMEOUT = 60
+
+# Only these variables are forwarded from the run workspace into the pooled worker
+FORWARDED_ENV = ("QA_RUN_DIR", "QA_ARTIFACTS_DIR", "QA_TARGET_URL")
+
+
+# --- WORKER PROCESS SIDE ---
+def _start_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    return webdriver.Chrome(options=options)
+
+
+class PooledDriver:
+    """
+    Hands the warm session to a script in place of a new `webdriver.Chrome()`.
+    Everything is delegated to the real driver except quit()/close(), which only
+    release it back to the pool.
+    """
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def maximize_window(self):
+        # Headless windows already have a fixed size
+        pass
+
+
+def _reset_driver(driver):
+    """
+    Wipes state left behind by the previous test: extra windows, storage, cookies and the page.
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    with contextlib.suppress(Exception):
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    with contextlib.suppress(Exception):
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.delete_all_cookies()
+    driver.get("about:blank")
+
+
+class CappedStream(io.TextIOBase):
+    """
+    Write-through text stream that keeps only the last `max_lines` lines, like the subprocess
+    executor's OutputBuffer (overlong lines are kept in MAX_LINE_LENGTH pieces), so a runaway
+    script cannot exhaust the worker's memory.
+    """
+
+    def __init__(self, max_lines=MAX_OUTPUT_LINES):
+        self.lines = OutputBuffer(max_lines)
+        self._partial = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        pieces = (self._partial + text).splitlines(keepends=True)
+        self._partial = ""
+        for piece in pieces:
+            while len(piece) > MAX_LINE_LENGTH:
+                self.lines.append(piece[:MAX_LINE_LENGTH])
+                piece = piece[MAX_LINE_LENGTH:]
+            if piece.endswith(("\n", "\r")):
+                self.lines.append(piece)
+            else:
+                self._partial = piece
+        return len(text)
+
+    def getvalue(self):
+        return self.lines.text() + self._partial
+
+
+def _run_script(driver, code, env, workspace, max_lines=MAX_OUTPUT_LINES):
+    from selenium import webdriver
+
+    stdout, stderr = CappedStream(max_lines), CappedStream(max_lines)
+    success = True
+
+    # Any `webdriver.Chrome(...)` in the script gets the warm session instead
+    original_chrome = webdriver.Chrome
+    webdriver.Chrome = lambda *args, **kwargs: PooledDriver(driver)
+    original_env = os.environ.copy()
+    original_cwd = os.getcwd()
+    os.environ.update(env)
+    os.chdir(workspace)
+
+    # Also on disk, for scripts that re-import themselves (e.g. suite modules calling pytest.main)
+    script_path = os.path.join(workspace, SCRIPT_NAME)
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(code)
+
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                exec(compile(code, script_path, "exec"), {"__name__": "__main__", "__file__": script_path})
+            except SystemExit as e:
+                success = e.code in (None, 0)
+            except BaseException:
+                traceback.print_exc()
+                success = False
+    finally:
+        webdriver.Chrome = original_chrome
+        os.environ.clear()
+        os.environ.update(original_env)
+        os.chdir(original_cwd)
+
+    return {
+        "success": success,
+        "status": "passed" if success else "failed",
+        "output": stdout.getvalue(),
+        "error": stderr.getvalue(),
+        "timings": {"test_body": time.perf_counter() - started}
+    }
+
+
+def _worker_main(conn):
+    # Own process group, so the pool can kill the worker together with its browser
+    if os.name == "posix":
+        os.setsid()
+
+    driver = None
+    try:
+        driver = _start_driver()
+        conn.send("ready")
+
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+
+            code, env, workspace, max_lines = message
+            result = _run_script(driver, code, env, workspace, max_lines)
+            started = time.perf_counter()
+            try:
+                _reset_driver(driver)
+                result["timings"]["browser_reset"] = time.perf_counter() - started
+                result["healthy"] = True
+            except Exception:
+                # The browser crashed or hung up; the pool will recycle this worker
+                result["healthy"] = False
+            conn.send(result)
+            if not result["healthy"]:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except Exception:
+        conn.send({"fatal": traceback.format_exc()})
+    finally:
+        if driver is not None:
+            with contextlib.suppress(Exception):
+                driver.quit()
+
+
+# --- POOL (PARENT PROCESS) SIDE ---
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.uses = 0
+        self.ready = False
+
+    def wait_ready(self, timeout=STARTUP_TIMEOUT):
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise RuntimeError("Timed out starting a pooled Chrome session.")
+            try:
+                message = self.conn.recv()
+            except EOFError:
+                raise RuntimeError("The pooled Chrome worker exited during startup.")
+            if message != "ready":
+                raise RuntimeError(f"Pooled Chrome session failed to start:\n{message.get('fatal', message)}")
+            self.ready = True
+
+    def kill(self):
+        if os.name == "posix":
+            with contextlib.suppress(Exception):
+                os.killpg(self.process.pid, signal.SIGKILL)
+        with contextlib.suppress(Exception):
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        with contextlib.suppress(Exception):
+            self.conn.send(None)
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.kill()
+
+
+class DriverPool:
+    """
+    Pool of worker processes, each holding one pre-started headless Chrome session.
+
+    A script is executed inside a worker with `webdriver.Chrome()` patched to return
+    the worker's warm session, so no interpreter or browser is started per test.
+    Sessions are reset between tests and recycled after `max_uses` runs, on crash or on timeout.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_uses=MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_Worker(self._context))
+
+    def _acquire(self):
+        worker = self._idle.get()
+        try:
+            worker.wait_ready()
+        except Exception:
+            worker.kill()
+            self._idle.put(_Worker(self._context))
+            raise
+        return worker
+
+    def _release(self, worker, recycle=False):
+        if recycle or not worker.process.is_alive():
+            worker.kill()
+            worker = _Worker(self._context)
+        elif worker.uses >= self.max_uses:
+            worker.stop()
+            worker = _Worker(self._context)
+        self._idle.put(worker)
+
+    def execute(self, code_string, timeout=DEFAULT_TIMEOUT, cancel_event=None, extra_env=None,
+                max_lines=MAX_OUTPUT_LINES):
+        """
+        Same contract as runner.execute_selenium_code, but runs on a warm session.
+        Output is capped at the last `max_lines` lines per stream inside the worker.
+        """
+        timings = {}
+        try:
+            with span("pool_acquire", timings):
+                worker = self._acquire()
+        except Exception as e:
+            return {"success": False, "status": "error", "output": "", "error": f"System Error: {str(e)}"}
+
+        try:
+            with run_workspace() as workspace:
+                env = {key: value for key, value in workspace_env(workspace, extra_env).items()
+                       if key in FORWARDED_ENV}
+                worker.conn.send((code_string, env, workspace, max_lines))
+                worker.uses += 1
+
+                deadline = time.monotonic() + timeout
+                while not worker.conn.poll(0.2):
+                    if not worker.process.is_alive():
+                        self._release(worker, recycle=True)
+                        return {"success": False, "status": "error", "output": "",
+                                "error": "System Error: The pooled browser session crashed."}
+                    if cancel_event is not None and cancel_event.is_set():
+                        self._release(worker, recycle=True)
+                        return {"success": False, "status": "cancelled", "output": "",
+                                "error": "Error: The test was cancelled."}
+                    if time.monotonic() >= deadline:
+                        self._release(worker, recycle=True)
+                        return {"success": False, "status": "timeout", "output": "",
+                                "error": f"Error: The test timed out (took longer than {timeout} seconds)."}
+
+                result = worker.conn.recv()
+        except Exception as e:
+            self._release(worker, recycle=True)
+            return {"success": False, "status": "error", "output": "", "error": f"System Error: {str(e)}"}
+
+        if "fatal" in result:
+            self._release(worker, recycle=True)
+            return {"success": False, "status": "error", "output": "", "error": f"System Error: {result['fatal']}"}
+
+        healthy = result.pop("healthy", False)
+        self._release(worker, recycle=not healthy)
+        # Phases measured in the worker process are recorded here, in the parent's metrics
+        for name, seconds in result.pop("timings", {}).items():
+            observe(name, seconds, timings)
+        result["timings"] = timings
+        return result
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    """
+    Returns the process-wide DriverPool, starting its browsers on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DriverPool()
+    return _pool
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from tracing import span
+
+MODEL_NAME = os.environ.get("QA_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+BATCH_SIZE = int(os.environ.get("QA_EMBEDDING_BATCH_SIZE", "64"))
+CACHE_PATH = os.environ.get("QA_EMBEDDING_CACHE", os.path.join(".embedding_cache", "embeddings.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.environ.get("QA_EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+
+class EmbeddingCache:
+    """
+    Disk-backed text-hash -> vector cache (SQLite).
+    Once the table grows past `max_entries`, the least recently used vectors are evicted.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for the keys that are cached, and marks them as recently used.
+        """
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE vectors SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """
+        Stores {key: vector} and evicts the oldest entries if the cache is over its limit.
+        """
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM vectors WHERE key IN "
+                    "(SELECT key FROM vectors ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class EmbeddingService(Embeddings):
+    """
+    LangChain-compatible embeddings that load the sentence-transformers model lazily,
+    embed in fixed-size batches and never embed the same text twice (see EmbeddingCache).
+    """
+
+    def __init__(self, model_name=MODEL_NAME, batch_size=BATCH_SIZE, cache=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from langchain_huggingface import HuggingFaceEmbeddings
+
+                    self._model = HuggingFaceEmbeddings(
+                        model_name=self.model_name,
+                        encode_kwargs={"batch_size": self.batch_size},
+                    )
+        return self._model
+
+    def _key(self, kind, text):
+        return hashlib.sha256(f"{self.model_name}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self._key("doc", text) for text in texts]
+        vectors = self.cache.get_many(list(set(keys)))
+
+        # Embed each missing text once, in batches
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            with span("embedding", texts=len(batch_keys)):
+                batch_vectors = self.model.embed_documents([missing[key] for key in batch_keys])
+            fresh = dict(zip(batch_keys, batch_vectors))
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key("query", text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+
+        with span("embedding", texts=1):
+            vector = self.model.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """
+    Returns the process-wide EmbeddingService (the model is loaded on first use).
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+    return _service
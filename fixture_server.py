@@ -0,0 +1,130 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+HOST = "127.0.0.1"
+PORT = int(os.environ.get("QA_FIXTURE_PORT", "0"))  # 0 = any free port
+ASSETS_DIR = os.environ.get("QA_ASSETS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"))
+MAX_PAGES = int(os.environ.get("QA_FIXTURE_MAX_PAGES", "256"))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "QAFixtureServer/1.0"
+
+    def log_message(self, format, *args):
+        # One line per browser request would drown the test logs
+        pass
+
+    def _send(self, status, body, content_type, head_only=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store" if status != 200 else "max-age=3600")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def _serve(self, head_only):
+        path = unquote(urlparse(self.path).path)
+        fixtures = self.server.fixtures
+
+        if path.startswith("/pages/"):
+            page = fixtures.page(posixpath.basename(path).rsplit(".", 1)[0])
+            if page is not None:
+                return self._send(200, page, "text/html; charset=utf-8", head_only)
+        elif path.startswith("/assets/"):
+            asset = fixtures.asset_path(path[len("/assets/"):])
+            if asset is not None:
+                with open(asset, "rb") as f:
+                    body = f.read()
+                content_type = mimetypes.guess_type(asset)[0] or "application/octet-stream"
+                return self._send(200, body, content_type, head_only)
+
+        self._send(404, b"Not Found", "text/plain; charset=utf-8", head_only)
+
+    def do_GET(self):
+        self._serve(head_only=False)
+
+    def do_HEAD(self):
+        self._serve(head_only=True)
+
+
+class FixtureServer:
+    """
+    In-process HTTP server for target pages.
+
+    Pages are registered once, kept in memory under their content hash and served at
+    http://127.0.0.1:<port>/pages/<hash>.html to any number of concurrent browsers.
+    Files in `assets/` are served under /assets/.
+    """
+
+    def __init__(self, host=HOST, port=PORT, assets_dir=ASSETS_DIR, max_pages=MAX_PAGES):
+        self.assets_dir = os.path.abspath(assets_dir)
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fixtures = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def register(self, html):
+        """
+        Stores a page (idempotent) and returns its URL.
+        """
+        body = html.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        with self._lock:
+            self._pages[digest] = body
+            self._pages.move_to_end(digest)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return f"{self.base_url}/pages/{digest}.html"
+
+    def page(self, digest):
+        with self._lock:
+            return self._pages.get(digest)
+
+    def asset_path(self, relative):
+        """
+        Absolute path of an asset, or None if it does not exist or escapes the assets dir.
+        """
+        path = os.path.abspath(os.path.join(self.assets_dir, relative))
+        if not path.startswith(self.assets_dir + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def asset_url(self, relative):
+        return f"{self.base_url}/assets/{relative}"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_fixture_server():
+    """
+    Returns the process-wide FixtureServer, starting it on first use.
+    """
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = FixtureServer()
+    return _server
@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+from prompts import script_prompt, suite_prompt
+from context_packing import count_tokens
+from tracing import span, record_llm_tokens
+
+MODEL_NAME = "gemini-2.5-flash"
+# "gemini" (default) or "stub" for an offline, deterministic model
+LLM_BACKEND = os.environ.get("QA_LLM_BACKEND", "gemini")
+# Answer repeated prompts from the on-disk response cache (see llm_cache.py)
+LLM_CACHE_ENABLED = os.environ.get("QA_LLM_CACHE_ENABLED", "1") == "1"
+
+MAX_CONCURRENCY = int(os.environ.get("QA_LLM_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.environ.get("QA_LLM_RPM", "60"))
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0   # Seconds; doubled on every retry (plus jitter)
+BACKOFF_MAX = 30.0
+
+
+def strip_code_fences(text):
+    """
+    Removes the ```python / ```json fences LLMs like to wrap their answers in.
+    """
+    return re.sub(r"```[a-zA-Z]*", "", text).strip()
+
+
+def chunk_text(chunk):
+    """
+    Text of one streamed response chunk ("" for chunks without text, which Gemini raises on).
+    """
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+# --- MODELS ---
+STUB_STREAM_CHUNK_CHARS = 64  # Size of the pieces the stub streams (like Gemini's partial responses)
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """
+    Offline stand-in for genai.GenerativeModel.
+    Returns deterministic test plans / scripts derived from the prompt, after `latency` seconds.
+    """
+
+    def __init__(self, model_name="stub", latency=None):
+        self.model_name = model_name
+        self.latency = float(os.environ.get("QA_STUB_LATENCY", "0")) if latency is None else latency
+
+    def _respond(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        if "SUITE MODULE" in prompt:
+            return StubResponse(
+                "def test_stub_" + digest + "(driver):\n"
+                "    assert driver.title is not None\n"
+            )
+        if "JSON SCHEMA" in prompt:
+            cases = [{
+                "Test_ID": f"TC-{index:03d}",
+                "Feature": "Stub Feature",
+                "Test_Scenario": f"Stub scenario {digest}-{index}",
+                "Expected_Result": "Stub result",
+                "Grounded_In": "product_specs.md",
+            } for index in range(1, 4)]
+            return StubResponse(json.dumps(cases, indent=2))
+
+        return StubResponse(
+            "```python\n"
+            "import time\n"
+            f"print('stub script {digest}')\n"
+            "```"
+        )
+
+    def generate_content(self, prompt, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(prompt)
+
+    def _stream(self, prompt):
+        # The latency is spread over the pieces, so the first one arrives early
+        text = self._respond(prompt).text
+        pieces = [text[start:start + STUB_STREAM_CHUNK_CHARS]
+                  for start in range(0, len(text), STUB_STREAM_CHUNK_CHARS)]
+        for piece in pieces:
+            if self.latency:
+                time.sleep(self.latency / len(pieces))
+            yield StubResponse(piece)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+
+def get_model(model_name=MODEL_NAME, backend=None, cached=None, refresh=False):
+    """
+    Returns the LLM used by the agent: Gemini, or the StubModel when QA_LLM_BACKEND=stub.
+    Unless `cached` is False, it is wrapped in the shared response cache; `refresh` skips cached
+    answers and replaces them with new ones (see llm_cache.CachedModel).
+    Every call is timed and its token counts recorded (see TracedModel).
+    """
+    if (backend or LLM_BACKEND) == "stub":
+        model = StubModel(model_name)
+    else:
+        # Imported here: the client library alone takes about a second to load
+        import google.generativeai as genai
+        if os.environ.get("GOOGLE_API_KEY"):
+            genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+        model = genai.GenerativeModel(model_name)
+
+    if cached is None:
+        cached = LLM_CACHE_ENABLED
+    if cached:
+        from llm_cache import CachedModel, get_llm_cache
+        model = CachedModel(model, get_llm_cache(), refresh=refresh)
+    return TracedModel(model)
+
+
+class TracedModel:
+    """
+    Records an "llm_call" span and prompt / response token counts for every call (see tracing.py).
+    Token counts come from the API's usage metadata when present and from the local counter
+    otherwise; the local prompt count is always logged too (prompt_tokens_local), to compare
+    with the budgets in context_packing.py.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _record(self, attributes, prompt, text, usage=None, cached=False):
+        prompt_tokens_local = count_tokens(str(prompt))
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or prompt_tokens_local
+        response_tokens = getattr(usage, "candidates_token_count", None) or count_tokens(text)
+        record_llm_tokens(prompt_tokens, response_tokens, model=self.model_name)
+        attributes.update(prompt_tokens=prompt_tokens, prompt_tokens_local=prompt_tokens_local,
+                          response_tokens=response_tokens, cached=cached)
+
+    def generate_content(self, prompt, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(prompt, kwargs)
+        with span("llm_call", model=self.model_name) as attributes:
+            response = self.model.generate_content(prompt, **kwargs)
+            self._record(attributes, prompt, response.text, getattr(response, "usage_metadata", None),
+                         getattr(response, "cached", False))
+        return response
+
+    def _stream(self, prompt, kwargs):
+        # The span covers the whole stream; first_chunk_ms is what the user waits before output
+        with span("llm_call", model=self.model_name, streamed=True) as attributes:
+            started = time.perf_counter()
+            response = self.model.generate_content(prompt, **kwargs)
+            pieces = []
+            for chunk in response:
+                if not pieces:
+                    attributes["first_chunk_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                pieces.append(chunk_text(chunk))
+                yield chunk
+            # A streamed Gemini response carries the usage of the whole answer once consumed
+            self._record(attributes, prompt, "".join(pieces), getattr(response, "usage_metadata", None),
+                         getattr(response, "cached", False))
+
+    async def generate_content_async(self, prompt, **kwargs):
+        if kwargs.get("stream"):
+            return await self.model.generate_content_async(prompt, **kwargs)
+        with span("llm_call", model=self.model_name) as attributes:
+            response = await self.model.generate_content_async(prompt, **kwargs)
+            self._record(attributes, prompt, response.text, getattr(response, "usage_metadata", None),
+                         getattr(response, "cached", False))
+        return response
+
+
+# --- RATE LIMITING ---
+class TokenBucket:
+    """
+    Async token bucket: `rate` requests per second on average, bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def is_rate_limit_error(error):
+    """
+    True for quota / 429 errors, which are worth retrying after a pause.
+    """
+    try:
+        from google.api_core import exceptions as google_exceptions
+        if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return True
+    except ImportError:
+        pass
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "quota" in message
+
+
+async def generate_with_retry(model, prompt, bucket=None, max_retries=MAX_RETRIES):
+    """
+    Calls `model.generate_content_async`, backing off exponentially on rate-limit errors.
+    """
+    for attempt in range(max_retries + 1):
+        if bucket is not None:
+            await bucket.acquire()
+        try:
+            return await model.generate_content_async(prompt)
+        except Exception as e:
+            if attempt == max_retries or not is_rate_limit_error(e):
+                raise
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+
+# --- BATCH GENERATION ---
+async def fan_out(items, make_prompt, model=None, concurrency=MAX_CONCURRENCY,
+                  requests_per_minute=REQUESTS_PER_MINUTE, on_result=None):
+    """
+    Sends `make_prompt(item)` for every item, `concurrency` calls at a time under a rate limit.
+    `on_result(item, text, error)` is called as soon as each call is done.
+    Returns a list of (item, text or None, error or None) in completion order.
+    """
+    model = model or get_model()
+    semaphore = asyncio.Semaphore(concurrency)
+    # A per-minute quota allows bursts: the first `concurrency` calls go out together
+    bucket = (TokenBucket(requests_per_minute / 60.0, capacity=min(concurrency, requests_per_minute))
+              if requests_per_minute else None)
+
+    async def generate_one(item):
+        async with semaphore:
+            try:
+                response = await generate_with_retry(model, make_prompt(item), bucket)
+                return item, response.text, None
+            except Exception as e:
+                return item, None, str(e)
+
+    results = []
+    for finished in asyncio.as_completed([generate_one(item) for item in items]):
+        item, text, error = await finished
+        results.append((item, text, error))
+        if on_result is not None:
+            on_result(item, text, error)
+    return results
+
+
+async def generate_scripts_async(test_cases, page_elements, on_result=None, **kwargs):
+    """
+    Generates one Selenium script per test case (see fan_out for the concurrency options).
+    `on_result(test_case, code, error)` is called as soon as each script is done.
+    Returns {Test_ID: {"code": str or None, "error": str or None}}.
+    """
+    def clean(test_case, text, error):
+        if on_result is not None:
+            on_result(test_case, strip_code_fences(text) if text is not None else None, error)
+
+    done = await fan_out(test_cases, lambda test_case: script_prompt(test_case, page_elements),
+                         on_result=clean, **kwargs)
+    return {
+        test_case["Test_ID"]: {"code": strip_code_fences(text) if text is not None else None, "error": error}
+        for test_case, text, error in done
+    }
+
+
+def generate_scripts(test_cases, page_elements, **kwargs):
+    """
+    Blocking wrapper around generate_scripts_async (for Streamlit / CLI callers).
+    """
+    return asyncio.run(generate_scripts_async(test_cases, page_elements, **kwargs))
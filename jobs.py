@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from runner import execute_selenium_code, DEFAULT_TIMEOUT
+
+MAX_WORKERS = int(os.environ.get("QA_JOB_WORKERS", str(os.cpu_count() or 2)))
+MAX_QUEUE_DEPTH = int(os.environ.get("QA_JOB_QUEUE_DEPTH", "500"))
+MAX_TIMEOUT = int(os.environ.get("QA_JOB_MAX_TIMEOUT", "600"))
+MAX_FINISHED_JOBS = int(os.environ.get("QA_JOB_HISTORY", "1000"))
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLED = "cancelled"
+FINISHED_STATES = {"passed", "failed", "timeout", "cancelled", "rejected", "error"}
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds `max_queue_depth` pending jobs."""
+
+
+class Job:
+    """
+    A single script execution tracked by the JobQueue.
+    """
+
+    def __init__(self, code, timeout, options=None):
+        self.id = uuid.uuid4().hex
+        self.code = code
+        self.timeout = timeout
+        # Extra keyword arguments for execute_selenium_code (executor, pacing, ...)
+        self.options = options or {}
+        self.status = QUEUED
+        self.result = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the job has finished (or `timeout` seconds). Returns True if it has.
+        """
+        return self.done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "timeout": self.timeout,
+            "options": self.options,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+        }
+
+
+class JobQueue:
+    """
+    Bounded worker pool for script executions.
+
+    - At most `max_workers` scripts run at the same time.
+    - At most `max_queue_depth` jobs wait; `submit()` raises QueueFullError beyond that.
+    - Queued jobs can be cancelled before they start; running jobs are killed.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queue_depth=MAX_QUEUE_DEPTH,
+                 max_finished=MAX_FINISHED_JOBS, execute=execute_selenium_code):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._execute = execute
+        # A `None` entry tells a worker to stop
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    # --- LIFECYCLE ---
+    def start(self):
+        if self._workers:
+            return
+        for index in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+
+    # --- PUBLIC API ---
+    def submit(self, code, timeout=DEFAULT_TIMEOUT, **options):
+        job = Job(code, min(timeout, MAX_TIMEOUT), options)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFullError(f"Job queue is full ({self._queue.maxsize} pending jobs).")
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. Returns the job, or None if it does not exist.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                # The worker will skip it when it is dequeued
+                self._finish(job, CANCELLED, {
+                    "success": False,
+                    "status": CANCELLED,
+                    "output": "",
+                    "error": "Error: The test was cancelled before it started."
+                })
+        return job
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._queue.maxsize,
+            "running": running,
+        }
+
+    # --- INTERNALS ---
+    def _finish(self, job, status, result):
+        job.status = status
+        job.result = result
+        job.finished_at = time.time()
+        job.done.set()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+
+                with self._lock:
+                    if job.status != QUEUED:
+                        continue
+                    job.status = RUNNING
+                    job.started_at = time.time()
+
+                try:
+                    result = self._execute(job.code, timeout=job.timeout, cancel_event=job.cancel_event,
+                                           **job.options)
+                except Exception as e:
+                    # Still finish the job, or pollers would see it RUNNING forever
+                    result = {"success": False, "status": "error", "output": "", "error": f"System Error: {str(e)}"}
+
+                with self._lock:
+                    self._finish(job, result.get("status", "passed" if result["success"] else "failed"), result)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,112 @@
+import json
+
+
+class JsonArrayParser:
+    """
+    Incremental parser for a streamed JSON array of objects (e.g. an LLM's test plan).
+
+    feed() takes text as it arrives and returns the items whose closing brace has been seen,
+    as (index, object or None, error or None). Anything before the opening "[" (code fences,
+    a sentence of preamble) is skipped. An item that does not parse is reported on its own;
+    the items around it are unaffected.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0     # Next character of _buffer to scan
+        self._started = False  # Seen the array's "["
+        self._done = False     # Seen the array's "]"
+        self._depth = 0        # Nesting inside the array (1 = between items)
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+        self._index = 0
+
+    def feed(self, text):
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer) and not self._done:
+            char = buffer[position]
+            if not self._started:
+                if char == "[":
+                    self._started, self._depth = True, 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                if self._item_start is None:
+                    self._item_start = position
+            elif char in "{[":
+                if self._depth == 1:
+                    self._item_start = position
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._item_start is not None:
+                    items.append(self._item(buffer[self._item_start:position + 1]))
+                    self._item_start = None
+                elif self._depth == 0:
+                    if self._item_start is not None:
+                        items.append(self._item(buffer[self._item_start:position]))
+                        self._item_start = None
+                    self._done = True
+            elif self._depth == 1:
+                if char == ",":
+                    if self._item_start is not None:
+                        # A bare value (number, string, ...) between two commas
+                        items.append(self._item(buffer[self._item_start:position]))
+                        self._item_start = None
+                elif not char.isspace() and self._item_start is None:
+                    self._item_start = position
+            position += 1
+
+        # Keep only what an unfinished item still needs
+        keep_from = self._item_start if self._item_start is not None else position
+        self._buffer = buffer[keep_from:]
+        if self._item_start is not None:
+            self._item_start = 0
+        self._position = position - keep_from
+        return items
+
+    def close(self):
+        """
+        Ends the stream. Returns an error item for an item cut off mid-way, and raises
+        ValueError if no array was found at all.
+        """
+        if not self._started:
+            raise ValueError("No JSON array in the response")
+        items = []
+        if self._item_start is not None and self._buffer[self._item_start:].strip():
+            items.append((self._index, None, "Incomplete item at the end of the response"))
+            self._index += 1
+        return items
+
+    def _item(self, text):
+        index = self._index
+        self._index += 1
+        text = text.strip().rstrip(",").strip()
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            return index, None, f"Invalid JSON ({e.msg} at char {e.pos}): {text[:120]}"
+        if not isinstance(value, dict):
+            return index, None, f"Expected an object, got {type(value).__name__}: {text[:120]}"
+        return index, value, None
+
+
+def iter_array_items(chunks):
+    """
+    Yields (index, object or None, error or None) for every item of the JSON array spread
+    over `chunks` (an iterable of text pieces), as soon as each item is complete.
+    """
+    parser = JsonArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
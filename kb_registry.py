@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+
+from knowledge_base import CHUNK_OVERLAP, CHUNK_SIZE, KB_ROOT, content_hash
+
+# vector_index (numpy, LangChain) is imported on first use, like the rest of the retrieval stack
+
+logger = logging.getLogger(__name__)
+
+# Immutable, content-addressed copies of every index the registry has served
+SNAPSHOT_ROOT = os.environ.get("QA_KB_SNAPSHOT_DIR", os.path.join(KB_ROOT, "_corpora"))
+MEMORY_BUDGET_MB = int(os.environ.get("QA_KB_MEMORY_BUDGET_MB", "1024"))
+
+SNAPSHOT_META = "corpus.json"
+SNAPSHOT_FORMAT = "sharded-v1"  # Part of corpus_key(), so a format change never reads old snapshots
+
+
+def corpus_key(source_hashes, embedding_model=""):
+    """
+    Identity of a corpus: the content of every source plus everything that shapes its vectors.
+    """
+    from vector_index import SHARD_BY
+
+    return content_hash(json.dumps({
+        "sources": sorted(source_hashes.items()),
+        "embedding_model": embedding_model,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "format": SNAPSHOT_FORMAT,
+        "shard_by": SHARD_BY,
+    }, sort_keys=True))
+
+
+def estimate_bytes(vector_db):
+    """
+    Approximate memory held by a vector store: for a LangChain FAISS store the vectors plus
+    the stored chunk texts, for a ShardedIndex its index files and chunk store, counted in full
+    (memory-mapped pages are resident once searched, even if the OS can drop them).
+    """
+    from vector_index import ShardedIndex
+
+    if isinstance(vector_db, ShardedIndex):
+        return vector_db.footprint_bytes()
+    index = vector_db.index
+    texts = sum(len(doc.page_content) + len(json.dumps(doc.metadata))
+                for doc in getattr(vector_db.docstore, "_dict", {}).values())
+    return index.ntotal * index.d * 4 + texts
+
+
+class Lease:
+    """
+    A session's hold on a shared index. The index is never evicted while a lease on it is
+    open; leases are released explicitly or when garbage-collected with the session.
+    """
+
+    def __init__(self, registry, key, vector_db, source_hashes):
+        self.key = key
+        self.vector_db = vector_db
+        self.source_hashes = source_hashes
+        self._finalizer = weakref.finalize(self, registry.release, key)
+
+    def release(self):
+        self._finalizer()
+
+
+class KnowledgeBaseRegistry:
+    """
+    Process-wide, read-only vector indexes shared by every session, keyed by corpus_key().
+
+    Ten sessions on the same documents share one index in memory. Indexes are served from
+    immutable on-disk snapshots (sharded, memory-mapped; see vector_index.ShardedIndex).
+    Indexes without open leases are evicted least-recently-used first once the total exceeds
+    the memory budget, and are reopened on the next acquire().
+    """
+
+    def __init__(self, embeddings, root=SNAPSHOT_ROOT, memory_budget_mb=MEMORY_BUDGET_MB):
+        self.embeddings = embeddings
+        self.root = root
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._entries = OrderedDict()  # key -> {"vector_db", "sources", "bytes", "refs"}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def has(self, key):
+        """
+        True if the corpus is loaded or can be reloaded from its snapshot.
+        """
+        with self._lock:
+            return key in self._entries or os.path.exists(os.path.join(self._path(key), SNAPSHOT_META))
+
+    def acquire(self, key):
+        """
+        Returns a Lease on the corpus, reloading it from disk if it was evicted, or None if
+        it has never been registered.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+                if entry is None:
+                    return None
+            self._entries.move_to_end(key)
+            entry["refs"] += 1
+            self._evict()
+            return Lease(self, key, entry["vector_db"], entry["sources"])
+
+    def register(self, key, vector_db, source_hashes):
+        """
+        Snapshots a freshly built LangChain FAISS store and returns a Lease on the snapshot.
+        If another session registered the same corpus first, its copy is shared instead.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._snapshot(key, vector_db, source_hashes)
+            return self.acquire(key)
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["refs"] = max(0, entry["refs"] - 1)
+                self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": len(self._entries),
+                "bytes": sum(entry["bytes"] for entry in self._entries.values()),
+                "budget_bytes": self.memory_budget,
+                "leases": sum(entry["refs"] for entry in self._entries.values()),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    # --- INTERNALS ---
+    def _snapshot(self, key, vector_db, source_hashes):
+        path = self._path(key)
+        if os.path.exists(os.path.join(path, SNAPSHOT_META)):
+            return
+        from vector_index import ShardedIndex
+
+        # Written to a temporary folder first, so a crash never leaves a half snapshot behind
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        ShardedIndex.write_faiss(tmp_path, vector_db)
+        with open(os.path.join(tmp_path, SNAPSHOT_META), "w", encoding="utf-8") as f:
+            json.dump({"sources": source_hashes}, f, indent=2)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # Another process won the race; its snapshot is identical
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _load(self, key):
+        path = self._path(key)
+        meta_path = os.path.join(path, SNAPSHOT_META)
+        if not os.path.exists(meta_path):
+            return None
+        from vector_index import ShardedIndex
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            sources = json.load(f)["sources"]
+        vector_db = ShardedIndex(path, self.embeddings)
+        entry = self._entries[key] = {"vector_db": vector_db, "sources": sources,
+                                      "bytes": estimate_bytes(vector_db), "refs": 0}
+        self.loads += 1
+        return entry
+
+    def _evict(self):
+        # (mapped files and SQLite handles of evicted indexes are closed once the last lease is gone)
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.memory_budget:
+                return
+            entry = self._entries[key]
+            if entry["refs"] == 0:
+                total -= entry["bytes"]
+                del self._entries[key]
+                self.evictions += 1
+        if total > self.memory_budget:
+            logger.warning("Knowledge bases in use need %.0f MB, above the %.0f MB budget",
+                           total / 2 ** 20, self.memory_budget / 2 ** 20)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_kb_registry(create=True):
+    """
+    Returns the process-wide KnowledgeBaseRegistry (using the shared embedding service),
+    or None if it does not exist yet and `create` is False.
+    """
+    global _registry
+    if _registry is None and create:
+        with _registry_lock:
+            if _registry is None:
+                from embeddings import get_embedding_service
+                _registry = KnowledgeBaseRegistry(get_embedding_service())
+    return _registry
@@ -0,0 +1,346 @@
+import codecs
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import time
+
+from tracing import span
+
+# LangChain / FAISS are imported on first use (see _faiss), so importing this module stays
+# cheap for the Streamlit app's cold start
+
+# Where the per-project indexes live (one sub-folder per project)
+KB_ROOT = os.environ.get("QA_KB_DIR", ".kb_store")
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# Streaming ingestion: bytes read per step, text held per file while chunking, chunks embedded per batch
+READ_BLOCK_BYTES = 64 * 1024
+WINDOW_CHARS = CHUNK_SIZE * 64
+INGEST_BATCH_SIZE = int(os.environ.get("QA_INGEST_BATCH_SIZE", "256"))
+INGEST_MAX_MEMORY_MB = int(os.environ.get("QA_INGEST_MAX_MEMORY_MB", "0"))  # 0 = no ceiling
+
+MANIFEST_FILE = "manifest.json"
+
+
+def content_hash(text):
+    """
+    Returns the sha256 hex digest of a piece of text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source, text):
+    """
+    Stable id for a chunk: the same text in the same file always maps to the same id.
+    """
+    return content_hash(f"{source}\x00{text}")
+
+
+class MemoryLimitError(MemoryError):
+    pass
+
+
+def _content_size(content):
+    if isinstance(content, str):
+        return len(content.encode("utf-8"))
+    if isinstance(content, (bytes, bytearray)):
+        return len(content)
+    size = getattr(content, "size", None)
+    if size is None:
+        position = content.tell()
+        size = content.seek(0, os.SEEK_END) - position
+        content.seek(position)
+    return size
+
+
+def source_hash(content):
+    """
+    content_hash() for text, bytes or a binary file object (read in blocks, then rewound).
+    """
+    if isinstance(content, str):
+        return content_hash(content)
+    if isinstance(content, (bytes, bytearray)):
+        return hashlib.sha256(content).hexdigest()
+    digest = hashlib.sha256()
+    content.seek(0)
+    for block in iter(lambda: content.read(READ_BLOCK_BYTES), b""):
+        digest.update(block)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def _iter_text(content, progress):
+    """
+    Yields the decoded text of `content` block by block (UTF-8, decoded incrementally, so
+    multi-byte characters split across blocks survive), counting bytes into `progress`.
+    """
+    if isinstance(content, str):
+        for start in range(0, len(content), READ_BLOCK_BYTES):
+            block = content[start:start + READ_BLOCK_BYTES]
+            progress["bytes_done"] += len(block.encode("utf-8"))
+            yield block
+        return
+
+    stream = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for block in iter(lambda: stream.read(READ_BLOCK_BYTES), b""):
+        progress["bytes_done"] += len(block)
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+def _rss_mb():
+    """
+    Current resident memory of this process in MB (None where /proc is not available).
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _check_memory(max_memory_mb):
+    if not max_memory_mb:
+        return
+    rss = _rss_mb()
+    if rss is not None and rss > max_memory_mb:
+        raise MemoryLimitError(
+            f"Ingestion stopped: process memory {rss:.0f} MB is above the {max_memory_mb} MB ceiling "
+            f"(QA_INGEST_MAX_MEMORY_MB). Lower QA_INGEST_BATCH_SIZE or raise the ceiling.")
+
+
+def _progress(progress):
+    """
+    Progress report passed to sync(on_progress=...): bytes / chunks done, fraction and ETA in seconds.
+    """
+    elapsed = time.monotonic() - progress["started"]
+    total = progress["bytes_total"] or 1
+    fraction = min(1.0, progress["bytes_done"] / total)
+    eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+    return {
+        "bytes_done": progress["bytes_done"],
+        "bytes_total": progress["bytes_total"],
+        "chunks_added": progress["chunks_added"],
+        "fraction": fraction,
+        "elapsed": elapsed,
+        "eta": eta,
+        "rss_mb": _rss_mb(),
+    }
+
+
+def _faiss():
+    from langchain_community.vectorstores import FAISS
+    return FAISS
+
+
+def _safe_name(project):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", project.strip()) or "default"
+
+
+class KnowledgeBase:
+    """
+    On-disk FAISS index for one project.
+
+    Chunks are stored under a hash of their source + content, so `sync()` only
+    embeds chunks that are new or changed and deletes the ones that disappeared.
+    Files whose content hash did not change are not even re-chunked.
+    """
+
+    def __init__(self, project, embeddings, root=KB_ROOT):
+        self.project = project
+        self.path = os.path.join(root, _safe_name(project))
+        self.embeddings = embeddings
+        self._splitter = None
+
+        # source -> {"hash": <file content hash>, "chunks": [<chunk ids>]}
+        self.sources = {}
+        self.vector_db = None
+        self._load()
+
+    @property
+    def splitter(self):
+        if self._splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            self._splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        return self._splitter
+
+    # --- PERSISTENCE ---
+    def _manifest_path(self):
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def _load(self):
+        if not os.path.exists(self._manifest_path()):
+            return
+
+        with open(self._manifest_path(), "r", encoding="utf-8") as f:
+            self.sources = json.load(f).get("sources", {})
+
+        if any(entry["chunks"] for entry in self.sources.values()):
+            # The index was written by us, so unpickling the docstore is safe
+            self.vector_db = _faiss().load_local(
+                self.path, self.embeddings, allow_dangerous_deserialization=True
+            )
+
+    def _save(self):
+        os.makedirs(self.path, exist_ok=True)
+
+        if self.vector_db is not None:
+            self.vector_db.save_local(self.path)
+        else:
+            for name in ("index.faiss", "index.pkl"):
+                file_path = os.path.join(self.path, name)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+        with open(self._manifest_path(), "w", encoding="utf-8") as f:
+            json.dump({"project": self.project, "sources": self.sources}, f, indent=2)
+
+    # --- INGESTION ---
+    def _iter_chunks(self, blocks):
+        """
+        Splits a stream of text blocks into chunks while holding at most ~WINDOW_CHARS of text.
+        The last chunk of each window may continue in the next block, so it is carried over.
+        """
+        buffer = ""
+        for block in blocks:
+            buffer += block
+            if len(buffer) < WINDOW_CHARS:
+                continue
+            pieces = self.splitter.split_text(buffer)
+            if len(pieces) < 2:
+                continue
+            yield from pieces[:-1]
+            tail_start = buffer.rfind(pieces[-1])
+            buffer = buffer[tail_start:] if tail_start >= 0 else pieces[-1]
+        if buffer.strip():
+            yield from self.splitter.split_text(buffer)
+
+    def sync(self, files, on_progress=None, batch_size=None, max_memory_mb=None):
+        """
+        Brings the index in line with `files` (a dict of source name -> content).
+        Content can be text, bytes or a seekable binary file object (e.g. an upload); files
+        are decoded, chunked and embedded as a stream, `batch_size` chunks at a time, so memory
+        does not grow with the size of the documents.
+        Sources missing from `files` are removed from the index.
+        `on_progress(progress)` is called after every batch (see _progress).
+        Raises MemoryLimitError, leaving the index as it was on disk, if the process grows past
+        `max_memory_mb` (QA_INGEST_MAX_MEMORY_MB; 0 disables the check).
+        Returns a dictionary with:
+        - added: Number of chunks embedded
+        - deleted: Number of chunks removed
+        - unchanged: Number of chunks reused as-is
+        - total: Number of chunks in the index afterwards
+        - timings: Milliseconds spent reading + chunking files and updating the index
+        """
+        batch_size = batch_size or INGEST_BATCH_SIZE
+        max_memory_mb = INGEST_MAX_MEMORY_MB if max_memory_mb is None else max_memory_mb
+        existing_ids = {cid for entry in self.sources.values() for cid in entry["chunks"]}
+        new_sources = {}
+        added = set()
+        timings = {}
+        progress = {"bytes_done": 0, "bytes_total": sum(_content_size(content) for content in files.values()),
+                    "chunks_added": 0, "started": time.monotonic()}
+        batch = []
+
+        def flush():
+            with span("index_update", timings, chunks=len(batch)):
+                self._add_batch(batch)
+            progress["chunks_added"] += len(batch)
+            batch.clear()
+            _check_memory(max_memory_mb)
+            if on_progress is not None:
+                on_progress(_progress(progress))
+
+        try:
+            for source, content in files.items():
+                file_hash = source_hash(content)
+                previous = self.sources.get(source)
+
+                if previous and previous["hash"] == file_hash:
+                    new_sources[source] = previous
+                    progress["bytes_done"] += _content_size(content)
+                    continue
+
+                # 1. Stream the file through the splitter; only new chunks are queued for embedding
+                chunk_ids = {}
+                blocks = _iter_text(content, progress)
+                # (includes the embedding batches flushed along the way, see "index_update")
+                with span("ingest_file", timings, source=source):
+                    for piece in self._iter_chunks(blocks):
+                        cid = chunk_id(source, piece)
+                        if cid in chunk_ids:
+                            continue
+                        chunk_ids[cid] = None
+                        if cid not in existing_ids and cid not in added:
+                            added.add(cid)
+                            batch.append((cid, piece, {"source": source, "chunk_id": cid}))
+                            # 2. Embed and index in fixed-size batches
+                            if len(batch) >= batch_size:
+                                flush()
+                new_sources[source] = {"hash": file_hash, "chunks": list(chunk_ids)}
+
+            if batch:
+                flush()
+            elif on_progress is not None:
+                on_progress(_progress(progress))
+        except BaseException:
+            # Drop the half-applied changes: go back to what is on disk
+            self.sources = {}
+            self.vector_db = None
+            self._load()
+            raise
+
+        wanted_ids = {cid for entry in new_sources.values() for cid in entry["chunks"]}
+        delete_ids = list(existing_ids - wanted_ids)
+
+        # 3. Remove what disappeared
+        if delete_ids and self.vector_db is not None:
+            if wanted_ids:
+                self.vector_db.delete(delete_ids)
+            else:
+                self.vector_db = None
+
+        self.sources = new_sources
+
+        # 4. Persist (only when something actually changed)
+        if added or delete_ids or not os.path.exists(self._manifest_path()):
+            self._save()
+
+        return {
+            "added": len(added),
+            "deleted": len(delete_ids),
+            "unchanged": len(wanted_ids) - len(added),
+            "total": len(wanted_ids),
+            "timings": timings,
+        }
+
+    def _add_batch(self, batch):
+        ids = [cid for cid, _, _ in batch]
+        texts = [text for _, text, _ in batch]
+        metadatas = [metadata for _, _, metadata in batch]
+        vectors = self.embeddings.embed_documents(texts)
+        if self.vector_db is None:
+            self.vector_db = _faiss().from_embeddings(list(zip(texts, vectors)), self.embeddings,
+                                                      metadatas=metadatas, ids=ids)
+        else:
+            self.vector_db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+    def source_hashes(self):
+        """
+        Returns {source: content hash} for every file currently in the index.
+        """
+        return {source: entry["hash"] for source, entry in self.sources.items()}
+
+    def clear(self):
+        """
+        Deletes the project's index from disk.
+        """
+        self.sources = {}
+        self.vector_db = None
+        shutil.rmtree(self.path, ignore_errors=True)
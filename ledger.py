@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from runner import execute_selenium_code, DEFAULT_EXECUTOR
+from script_transform import DEFAULT_PACING
+
+LEDGER_PATH = os.environ.get("QA_LEDGER", os.path.join(".qa_ledger", "ledger.sqlite3"))
+MAX_LOG_CHARS = 20000  # Per stream, per recorded run
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def grounded_sources(grounded_in, source_hashes):
+    """
+    Resolves a test case's `Grounded_In` ("product_specs.md", "a.md, b.txt", a list, ...)
+    to {source: content hash}. Sources that are not in the knowledge base map to None.
+    """
+    if isinstance(grounded_in, str):
+        names = [name.strip() for name in re.split(r"[,;\n]", grounded_in) if name.strip()]
+    else:
+        names = [str(name).strip() for name in grounded_in or []]
+
+    by_basename = {os.path.basename(source): source for source in source_hashes}
+    resolved = {}
+    for name in names:
+        source = name if name in source_hashes else by_basename.get(os.path.basename(name))
+        resolved[source or name] = source_hashes.get(source) if source else None
+    return resolved
+
+
+def run_key(code, html, sources, executor=None, pacing=None):
+    """
+    Identity of a run: the script, the target HTML, the content of the sources it is grounded in,
+    and how it runs (pacing rewrites the code that actually executes; see script_transform.py).
+    """
+    payload = json.dumps({
+        "script": _sha256(code),
+        "html": _sha256(html or ""),
+        "sources": sorted(sources.items(), key=lambda item: item[0]),
+        "executor": executor or DEFAULT_EXECUTOR,
+        "pacing": pacing or DEFAULT_PACING,
+    }, sort_keys=True)
+    return _sha256(payload)
+
+
+class ExecutionLedger:
+    """
+    SQLite record of past executions (outcome, duration, logs) keyed by run_key().
+    A run whose key already has a passing entry can be skipped: nothing it depends on changed.
+    Failures are never reused, so flaky tests always get another attempt.
+    """
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, test_id TEXT, sources TEXT, "
+            "status TEXT, success INTEGER, duration REAL, output TEXT, error TEXT, created REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_key ON runs (key, success)")
+        self._conn.commit()
+
+    def record(self, key, result, duration, test_id=None, sources=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (key, test_id, sources, status, success, duration, output, error, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, test_id, json.dumps(sources or {}), result["status"], int(result["success"]), duration,
+                 result["output"][-MAX_LOG_CHARS:], result["error"][-MAX_LOG_CHARS:], time.time()),
+            )
+            self._conn.commit()
+
+    def last_pass(self, key):
+        """
+        Returns the latest passing run for `key` as a dict, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, duration, output, error, created FROM runs "
+                "WHERE key = ? AND success = 1 ORDER BY id DESC LIMIT 1", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, duration, output, error, created = row
+        return {"status": status, "duration": duration, "output": output, "error": error, "created": created}
+
+
+def cached_result(previous):
+    """
+    Turns a ledger entry into an execute_selenium_code-style result marked as skipped.
+    """
+    return {
+        "success": True,
+        "status": "passed",
+        "output": previous["output"],
+        "error": previous["error"],
+        "skipped": True,
+        "cached_at": previous["created"],
+        "duration": previous["duration"],
+    }
+
+
+def execute_with_ledger(code, html, grounded_in, source_hashes, ledger=None, only_affected=True,
+                        test_id=None, execute=execute_selenium_code, **run_options):
+    """
+    execute_selenium_code plus change-based skipping.
+    With `only_affected`, a script whose code, target HTML and grounded sources are unchanged
+    since its last passing run is not executed again; the recorded result is returned instead
+    (with "skipped": True). Every real run is recorded in the ledger.
+    `execute(code, **run_options)` runs the script (e.g. streaming it, or on a backend instance);
+    if it raises, nothing is recorded.
+    """
+    ledger = ledger or get_ledger()
+    sources = grounded_sources(grounded_in, source_hashes)
+    key = run_key(code, html, sources, run_options.get("executor"), run_options.get("pacing"))
+
+    if only_affected:
+        previous = ledger.last_pass(key)
+        if previous is not None:
+            return cached_result(previous)
+
+    started = time.monotonic()
+    result = execute(code, **run_options)
+    duration = time.monotonic() - started
+    ledger.record(key, result, duration, test_id=test_id, sources=sources)
+    result["duration"] = round(duration, 3)
+    return result
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """
+    Returns the process-wide ExecutionLedger.
+    """
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = ExecutionLedger()
+    return _ledger
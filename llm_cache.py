@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.environ.get("QA_LLM_CACHE", os.path.join(".llm_cache", "responses.sqlite3"))
+CACHE_TTL = float(os.environ.get("QA_LLM_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
+CACHE_MAX_ENTRIES = int(os.environ.get("QA_LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+def normalize_prompt(prompt):
+    """
+    Unifies line endings and drops trailing whitespace, so prompts that differ only in those
+    share a cache entry. Indentation is kept: in code (repair prompts) it is meaningful.
+    """
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+class LLMCache:
+    """
+    Disk-backed (SQLite) response cache keyed by model name + normalized prompt hash.
+    Entries expire after `ttl` seconds; beyond `max_entries` the least recently used go first.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, model TEXT, text TEXT, created REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model_name, prompt, options=None):
+        payload = f"{model_name}\x00{normalize_prompt(prompt)}"
+        if options:
+            payload += "\x00" + json.dumps(options, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model_name, text):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, text, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """
+        Returns hits, misses, hit_rate and the number of stored entries.
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+class CachedResponse:
+    def __init__(self, text, cached):
+        self.text = text
+        self.cached = cached
+
+
+class CachedStream:
+    """
+    Streamed response that is stored in the cache once it has been read to the end.
+    A cache hit is replayed as a single chunk.
+    """
+
+    def __init__(self, chunks, on_complete=None, cached=False):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self.cached = cached
+
+    def __iter__(self):
+        pieces = []
+        for chunk in self._chunks:
+            try:
+                pieces.append(chunk.text)
+            except ValueError:  # Gemini chunks without text (e.g. the finish-reason-only one)
+                pass
+            yield chunk
+        if self._on_complete is not None:
+            self._on_complete("".join(pieces))
+
+    def __getattr__(self, name):
+        # usage_metadata and friends of the underlying streamed response
+        return getattr(self._chunks, name)
+
+
+class CachedModel:
+    """
+    Wraps a genai.GenerativeModel (or StubModel) so identical prompts are answered from LLMCache.
+    Streamed (stream=True) and regular calls share cache entries.
+    With `refresh`, cached answers are not used (a "Regenerate"); the new answers replace them.
+    Empty answers are never stored.
+    """
+
+    def __init__(self, model, cache, refresh=False):
+        self.model = model
+        self.cache = cache
+        self.refresh = refresh
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _get(self, key):
+        return None if self.refresh else self.cache.get(key)
+
+    def _put(self, key, text):
+        if text:
+            self.cache.put(key, self.model_name, text)
+
+    def generate_content(self, prompt, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(prompt, kwargs)
+
+        key = LLMCache.key(self.model_name, prompt, kwargs)
+        text = self._get(key)
+        if text is not None:
+            return CachedResponse(text, cached=True)
+
+        response = self.model.generate_content(prompt, **kwargs)
+        self._put(key, response.text)
+        return CachedResponse(response.text, cached=False)
+
+    def _stream(self, prompt, kwargs):
+        options = {name: value for name, value in kwargs.items() if name != "stream"}
+        key = LLMCache.key(self.model_name, prompt, options)
+        text = self._get(key)
+        if text is not None:
+            return CachedStream([CachedResponse(text, cached=True)], cached=True)
+        return CachedStream(self.model.generate_content(prompt, **kwargs),
+                            on_complete=lambda text: self._put(key, text))
+
+    async def generate_content_async(self, prompt, **kwargs):
+        if kwargs.get("stream"):
+            return await self.model.generate_content_async(prompt, **kwargs)
+
+        key = LLMCache.key(self.model_name, prompt, kwargs)
+        text = self._get(key)
+        if text is not None:
+            return CachedResponse(text, cached=True)
+
+        response = await self.model.generate_content_async(prompt, **kwargs)
+        self._put(key, response.text)
+        return CachedResponse(response.text, cached=False)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Returns the process-wide LLMCache.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import re
+
+from context_packing import PAGE_ELEMENTS_SHARE, RETRIEVAL_CANDIDATES, fit_page_elements, pack_context, remaining_tokens
+from generation import chunk_text, fan_out
+from json_stream import iter_array_items
+from prompts import test_plan_prompt
+from tracing import span
+
+# Instruction sent for each feature of a batch (same wording as the single-feature default)
+FEATURE_QUERY = "Generate positive and negative test cases for the {feature} feature."
+
+# Every test case must have these, as non-empty strings (see prompts.test_plan_prompt)
+TEST_CASE_FIELDS = ("Test_ID", "Feature", "Test_Scenario", "Expected_Result", "Grounded_In")
+
+# Markdown headings ("## Discount Codes"); level 1 is usually the document title
+_HEADING = re.compile(r"^(#{1,3})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+
+def spec_features(vector_db, max_features=50):
+    """
+    Suggests features to cover from the headings of the documents in the knowledge base
+    (document order, duplicates removed). Level-1 headings are only used if there are no others.
+    """
+    from vector_index import iter_documents
+
+    headings = {}  # lowercase -> (level, text), first occurrence wins
+    for doc in iter_documents(vector_db):
+        for marks, text in _HEADING.findall(doc.page_content):
+            headings.setdefault(text.strip().lower(), (len(marks), text.strip()))
+
+    levels = {level for level, _ in headings.values()}
+    min_level = 2 if levels - {1} else 1
+    return [text for level, text in headings.values() if level >= min_level][:max_features]
+
+
+def _scenario_key(test_case):
+    text = f"{test_case.get('Test_Scenario', '')} {test_case.get('Expected_Result', '')}"
+    return " ".join(re.sub(r"\W+", " ", text.lower()).split())
+
+
+def merge_test_plans(plans):
+    """
+    Merges per-feature test plans ([(feature, [test cases])], in the order to keep) into one list:
+    test cases with the same scenario and expected result are kept once, and every test case
+    gets a new, globally unique Test_ID (TC-001, TC-002, ...).
+    Returns (test_cases, number of duplicates dropped).
+    """
+    merged, seen = [], set()
+    duplicates = 0
+    for feature, test_cases in plans:
+        for test_case in test_cases:
+            key = _scenario_key(test_case)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            merged.append({**test_case, "Feature": test_case.get("Feature") or feature})
+
+    for number, test_case in enumerate(merged, start=1):
+        test_case["Test_ID"] = f"TC-{number:03d}"
+    return merged, duplicates
+
+
+def validate_test_case(test_case):
+    """
+    Returns the schema problems of one test case (an empty list if it is valid).
+    """
+    return [f"missing {field}" for field in TEST_CASE_FIELDS
+            if not isinstance(test_case.get(field), str) or not test_case[field].strip()]
+
+
+def iter_test_plan(chunks):
+    """
+    Yields (test case or None, error or None) for each item of a test plan streamed as text
+    `chunks`, as soon as the item is complete. Invalid items are reported and skipped; the valid
+    ones before and after them are kept. Raises ValueError if the response has no JSON array.
+    """
+    for index, item, error in iter_array_items(chunks):
+        if error is None:
+            problems = validate_test_case(item)
+            if problems:
+                error = f"{', '.join(problems)}: {json.dumps(item)[:120]}"
+        if error is not None:
+            yield None, f"Item {index + 1}: {error}"
+        else:
+            yield item, None
+
+
+def stream_test_plan(model, prompt):
+    """
+    Streams the model's answer to `prompt` through iter_test_plan.
+    """
+    yield from iter_test_plan(chunk_text(chunk) for chunk in model.generate_content(prompt, stream=True))
+
+
+def _parse_plan(text):
+    test_cases, errors = [], []
+    for test_case, error in iter_test_plan([text]):
+        if error is None:
+            test_cases.append(test_case)
+        else:
+            errors.append(error)
+    return test_cases, errors
+
+
+async def generate_test_plans_async(vector_db, features, html, k=RETRIEVAL_CANDIDATES, filter=None,
+                                    on_result=None, timings=None, **kwargs):
+    """
+    Generates one test plan per feature and merges them (see merge_test_plans).
+    Retrieval for all features is one batched FAISS search; the LLM calls run concurrently
+    under a rate limit (see generation.fan_out for the options).
+    `on_result(feature, test_cases or None, error)` is called as soon as each plan is done.
+    Returns a dictionary with:
+    - test_cases: The merged test plan
+    - features: {feature: {"count": valid test cases, "invalid": [errors of the items skipped],
+      "error": str or None}}
+    - duplicates: Number of test cases dropped as duplicates of another feature's
+    """
+    from vector_index import batch_search_with_score
+
+    features = list(dict.fromkeys(feature.strip() for feature in features if feature.strip()))
+    queries = [FEATURE_QUERY.format(feature=feature) for feature in features]
+
+    # 1. One FAISS search for every feature. The queries are embedded as queries (not documents),
+    # so each feature retrieves what a single-feature plan would
+    with span("faiss_search", timings, queries=len(queries)):
+        vectors = [vector_db.embeddings.embed_query(query) for query in queries]
+        hits = batch_search_with_score(vector_db, vectors, k=k, filter=filter)
+
+    # 2. Token-budgeted prompts; the page elements are shared, sized for the longest request
+    page_elements = fit_page_elements(html, "test_plan", *[test_plan_prompt("", "", query) for query in queries],
+                                      share=PAGE_ELEMENTS_SHARE, timings=timings)
+    prompts = {}
+    for feature, query, docs_and_scores in zip(features, queries, hits):
+        budget = remaining_tokens("test_plan", test_plan_prompt("", page_elements, query))
+        context_text = pack_context(docs_and_scores, budget, timings, phase="test_plan")
+        prompts[feature] = test_plan_prompt(context_text, page_elements, query)
+
+    # 3. Concurrent generation
+    plans, report = {}, {}
+
+    def collect(feature, text, error):
+        test_cases, invalid = None, []
+        if error is None:
+            try:
+                test_cases, invalid = _parse_plan(text)
+            except ValueError as e:
+                error = f"Invalid test plan: {e}"
+        plans[feature] = test_cases or []
+        report[feature] = {"count": len(test_cases or []), "invalid": invalid, "error": error}
+        if on_result is not None:
+            on_result(feature, test_cases, error)
+
+    with span("test_plan_generation", timings, features=len(features)):
+        await fan_out(features, prompts.__getitem__, on_result=collect, **kwargs)
+
+    # 4. Merge in the order the features were given
+    test_cases, duplicates = merge_test_plans([(feature, plans[feature]) for feature in features])
+    return {"test_cases": test_cases, "features": {feature: report[feature] for feature in features},
+            "duplicates": duplicates}
+
+
+def generate_test_plans(vector_db, features, html, **kwargs):
+    """
+    Blocking wrapper around generate_test_plans_async.
+    """
+    return asyncio.run(generate_test_plans_async(vector_db, features, html, **kwargs))
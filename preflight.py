@@ -0,0 +1,177 @@
+import ast
+import os
+import re
+import time
+
+# Top-level modules a generated test may import
+ALLOWED_IMPORTS = {
+    "selenium", "pytest", "unittest", "time", "os", "sys", "re", "json", "math", "random", "string",
+    "datetime", "pathlib", "tempfile", "traceback", "logging", "typing", "contextlib", "decimal",
+} | {name.strip() for name in os.environ.get("QA_PREFLIGHT_EXTRA_IMPORTS", "").split(",") if name.strip()}
+
+LOCATOR_STRATEGIES = {"ID", "NAME", "CLASS_NAME", "CSS_SELECTOR", "XPATH", "TAG_NAME", "LINK_TEXT",
+                      "PARTIAL_LINK_TEXT"}
+
+
+def _diagnostic(level, line, message):
+    return {"level": level, "line": line, "message": message}
+
+
+def extract_locators(tree):
+    """
+    Returns every (By.<STRATEGY>, "value") pair in the script, as dicts with strategy, value and line.
+    Covers find_element(By.ID, "x") as well as tuples like EC.presence_of_element_located((By.ID, "x")).
+    """
+    locators = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            pair = node.args[:2]
+        elif isinstance(node, ast.Tuple):
+            pair = node.elts[:2]
+        else:
+            continue
+        if len(pair) != 2:
+            continue
+        strategy, value = pair
+        if (isinstance(strategy, ast.Attribute) and isinstance(strategy.value, ast.Name)
+                and strategy.value.id == "By" and strategy.attr in LOCATOR_STRATEGIES
+                and isinstance(value, ast.Constant) and isinstance(value.value, str)):
+            locators.append({"strategy": strategy.attr, "value": value.value, "line": node.lineno})
+    return locators
+
+
+class TargetDom:
+    """
+    Parsed target HTML that can answer "does this locator match anything?".
+    """
+
+    def __init__(self, html):
+        from bs4 import BeautifulSoup
+
+        self.html = html
+        self.soup = BeautifulSoup(html, "html.parser")
+        self._lxml = None
+
+    def _xpath(self, expression):
+        if self._lxml is None:
+            import lxml.html
+            self._lxml = lxml.html.fromstring(self.html)
+        # Absolute paths start at <html>, which lxml's fromstring returns as the root
+        return self._lxml.getroottree().xpath(expression)
+
+    def matches(self, strategy, value):
+        """
+        Number of elements matched (0 if none). Raises ValueError for an invalid selector
+        and ImportError if XPath support (lxml) is missing.
+        """
+        if strategy == "ID":
+            return len(self.soup.find_all(id=value))
+        if strategy == "NAME":
+            return len(self.soup.find_all(attrs={"name": value}))
+        if strategy == "CLASS_NAME":
+            if not value or re.search(r"\s", value):
+                raise ValueError("class names cannot contain spaces (use By.CSS_SELECTOR)")
+            return len(self.soup.find_all(class_=value))
+        if strategy == "TAG_NAME":
+            return len(self.soup.find_all(value.lower()))
+        if strategy == "LINK_TEXT":
+            return sum(1 for a in self.soup.find_all("a") if a.get_text(strip=True) == value)
+        if strategy == "PARTIAL_LINK_TEXT":
+            return sum(1 for a in self.soup.find_all("a") if value in a.get_text(strip=True))
+        if strategy == "CSS_SELECTOR":
+            try:
+                return len(self.soup.select(value))
+            except Exception as e:
+                raise ValueError(f"invalid CSS selector ({str(e).splitlines()[0]})")
+        if strategy == "XPATH":
+            try:
+                found = self._xpath(value)
+            except ImportError:
+                raise
+            except Exception as e:
+                raise ValueError(f"invalid XPath ({str(e).splitlines()[0]})")
+            return len(found) if isinstance(found, list) else int(bool(found))
+        return 0
+
+
+def preflight(code_string, html=None):
+    """
+    Static checks run before a browser is started:
+    1. No markdown fences left behind by the LLM
+    2. The script compiles
+    3. Imports are on the ALLOWED_IMPORTS list
+    4. Every By.* locator resolves against the target HTML (when `html` is given). A locator
+       that matches nothing is only a warning: the element may be added by JavaScript at run time
+       (e.g. a "Payment Successful" message); an invalid selector is an error.
+    Returns a dictionary with:
+    - ok: True if there are no errors
+    - diagnostics: [{"level": "error" | "warning", "line": int, "message": str}]
+    - locators: The extracted locators, each with its match count
+    - elapsed_ms: Time taken
+    """
+    started = time.perf_counter()
+    diagnostics = []
+    locators = []
+
+    # 1. Markdown leftovers
+    for number, line in enumerate(code_string.splitlines(), start=1):
+        if line.strip().startswith("```"):
+            diagnostics.append(_diagnostic("error", number, "Markdown code fence left in the script"))
+
+    # 2. Syntax
+    try:
+        tree = ast.parse(code_string)
+        compile(tree, "generated_test_script.py", "exec")
+    except SyntaxError as e:
+        diagnostics.append(_diagnostic("error", e.lineno, f"SyntaxError: {e.msg}"))
+        tree = None
+
+    if tree is not None:
+        # 3. Imports
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                if module.split(".")[0] not in ALLOWED_IMPORTS:
+                    diagnostics.append(_diagnostic("error", node.lineno, f"Import of '{module}' is not allowed"))
+
+        # 4. Locators
+        locators = extract_locators(tree)
+        if html:
+            dom = TargetDom(html)
+            for locator in locators:
+                where = f"By.{locator['strategy']} '{locator['value']}'"
+                try:
+                    locator["matches"] = dom.matches(locator["strategy"], locator["value"])
+                except ImportError:
+                    locator["matches"] = None
+                    diagnostics.append(_diagnostic("warning", locator["line"],
+                                                   f"{where} not checked: install lxml for XPath support"))
+                    continue
+                except ValueError as e:
+                    locator["matches"] = 0
+                    diagnostics.append(_diagnostic("error", locator["line"], f"{where}: {e}"))
+                    continue
+                if locator["matches"] == 0:
+                    diagnostics.append(_diagnostic("warning", locator["line"],
+                                                   f"{where} does not match any element in the static HTML "
+                                                   "(fine if the page adds it at run time)"))
+
+    diagnostics.sort(key=lambda d: (d["line"] or 0))
+    return {
+        "ok": not any(d["level"] == "error" for d in diagnostics),
+        "diagnostics": diagnostics,
+        "locators": locators,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def format_diagnostics(diagnostics):
+    """
+    One "line N: [error] message" per diagnostic (used in logs and repair prompts).
+    """
+    return "\n".join(f"line {d['line']}: [{d['level']}] {d['message']}" for d in diagnostics)
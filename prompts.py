@@ -0,0 +1,130 @@
+import json
+
+
+def format_context(docs):
+    """
+    Renders retrieved chunks as "[Source: file]: text" blocks.
+    """
+    return "\n\n".join(
+        [f"[Source: {d.metadata.get('source', 'doc')}]: {d.page_content}" for d in docs])
+
+
+def test_plan_prompt(context_text, page_elements, user_query):
+    """
+    Phase 2: RAG-grounded test plan (JSON list of test cases).
+    """
+    return f"""
+    You are a Senior QA Automation Engineer.
+    Generate a structured test plan based **strictly** on the provided Documentation Context and HTML.
+
+    ---
+    DOCUMENTATION CONTEXT:
+    {context_text}
+    ---
+    TARGET PAGE ELEMENTS (one per line: tag#id.class attributes label text handlers):
+    {page_elements}
+    ---
+    USER REQUEST: {user_query}
+    ---
+
+    INSTRUCTIONS:
+    1. Create comprehensive test cases (Positive & Negative).
+    2. Use 'Test_ID' like TC-001, TC-002.
+    3. 'Grounded_In' must reference the specific source file provided in context.
+    4. Output strictly valid JSON list format. No Markdown blocks.
+
+    JSON SCHEMA:
+    [
+        {{
+            "Test_ID": "TC-001",
+            "Feature": "Discount Code",
+            "Test_Scenario": "Enter valid code 'SAVE20'",
+            "Expected_Result": "Total reduces by 20%",
+            "Grounded_In": "product_specs.md"
+        }}
+    ]
+    """
+
+
+def script_prompt(test_case, page_elements):
+    """
+    Phase 3: one standalone Selenium script for one test case.
+    """
+    return f"""
+    You are a Python Selenium Expert.
+    Write a complete, runnable Python script for the following test case.
+
+    TEST CASE:
+    {json.dumps(test_case)}
+
+    TARGET PAGE ELEMENTS (one per line: tag#id.class attributes label text handlers):
+    {page_elements}
+
+    STRICT REQUIREMENTS:
+    1. Use `webdriver.Chrome()`.
+    2. Initialize the driver normally (NOT headless) and maximize the window.
+    3. Add `import os` and `import time` at the top.
+    4. Open the target page with `driver.get(os.environ.get("QA_TARGET_URL", "<URL>"))`, where <URL> is
+       the URL given in TARGET PAGE ELEMENTS (used when the script is run on its own).
+       Do NOT embed the HTML in the script or write it to a file.
+    5. Add `time.sleep(2)` immediately after `driver.get()`.  <-- ADD THIS
+    6. Add `time.sleep(1)` BEFORE every `.click()` or `.send_keys()` action. <-- ADD THIS
+    7. Use exact ID/Class selectors found in the TARGET PAGE ELEMENTS.
+    8. Include assertions to verify the `Expected_Result`.
+    9. If the `QA_BROWSER_PROFILE_DIR` environment variable is set, pass it to Chrome as `--user-data-dir`.
+    10. Save any screenshots or other artifacts into the `QA_ARTIFACTS_DIR` environment variable folder.
+    11. Return ONLY the Python code (no markdown formatting).
+    """
+
+
+def suite_prompt(feature, test_cases, page_elements):
+    """
+    Phase 3 (suite mode): pytest test functions for every test case of one feature.
+    The fixtures (browser, page load, state reset) come from the module scaffold, not the LLM.
+    """
+    return f"""
+    You are a Python Selenium Expert.
+    Write the pytest test functions of a SUITE MODULE for the feature "{feature}".
+
+    TEST CASES:
+    {json.dumps(test_cases, indent=2)}
+
+    TARGET PAGE ELEMENTS (one per line: tag#id.class attributes label text handlers):
+    {page_elements}
+
+    STRICT REQUIREMENTS:
+    1. Write one function per test case, named `test_<Test_ID>` with non-alphanumerics replaced by `_`
+       (e.g. `def test_TC_001(driver):`), with the test case JSON as its docstring.
+    2. Every function takes the `driver` fixture. It is already provided, with the page loaded
+       and cookies / storage reset. Do NOT create a WebDriver, call `driver.get()` or `driver.quit()`.
+    3. Do NOT define fixtures, write HTML files or add a `__main__` block.
+    4. Use `WebDriverWait` / `expected_conditions` for dynamic content, never `time.sleep()`.
+    5. Use exact ID/Class selectors found in the TARGET PAGE ELEMENTS.
+    6. Include assertions to verify each `Expected_Result`.
+    7. Import what you use (`By`, `WebDriverWait`, `expected_conditions as EC`).
+    8. Return ONLY the Python code (no markdown formatting).
+    """
+
+
+def repair_prompt(code, diagnostics_text, page_elements):
+    """
+    Phase 3 retry: asks for a corrected script given the pre-flight diagnostics.
+    """
+    return f"""
+    You are a Python Selenium Expert.
+    The script below was rejected by a static pre-flight check before it could run.
+    Fix every problem listed and return the complete corrected script.
+
+    DIAGNOSTICS:
+    {diagnostics_text}
+
+    TARGET PAGE ELEMENTS (one per line: tag#id.class attributes label text handlers):
+    {page_elements}
+
+    SCRIPT:
+    {code}
+
+    Only use selectors that appear in the TARGET PAGE ELEMENTS.
+    Keep everything else (pacing, assertions, driver setup) unchanged.
+    Return ONLY the Python code (no markdown formatting).
+    """
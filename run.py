@@ -1,11 +1,11 @@
-import os
-import tempfile
 import time
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from fixture_server import get_fixture_server
+
 # --- HTML CONTENT (Same as before) ---
 html_content = """
 <!DOCTYPE html>
@@ -99,20 +99,17 @@ html_content = """
 
 def run_visual_test():
     driver = None
-    html_file_path = None
     try:
         # 1. Setup
         print("🚀 Setting up test environment...")
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".html", encoding='utf-8') as f:
-            f.write(html_content)
-            html_file_path = f.name
+        page_url = get_fixture_server().register(html_content)
 
         driver = webdriver.Chrome()
         driver.maximize_window()
 
         # 2. Load Page
-        print(f"📂 Opening file: {html_file_path}")
-        driver.get(f"file:///{html_file_path}")
+        print(f"📂 Opening page: {page_url}")
+        driver.get(page_url)
         time.sleep(1)  # Wait so we can see the page load in the video
 
         print("\n--- 🎬 STARTING TEST: TC-DC-001 ---")
@@ -162,8 +159,6 @@ def run_visual_test():
     finally:
         if driver:
             driver.quit()
-        if html_file_path and os.path.exists(html_file_path):
-            os.remove(html_file_path)
 
 
 if __name__ == "__main__":
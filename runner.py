@@ -1,48 +1,325 @@
+import json
 import subprocess
 import sys
 import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 
+from script_transform import apply_pacing, PACINGS
+from preflight import preflight, format_diagnostics
+from tracing import span, observe, RUNS_IN_FLIGHT, RUNS_TOTAL
 
-def execute_selenium_code(code_string):
+DEFAULT_TIMEOUT = 60  # Safety timeout (1 minute)
+SCRIPT_NAME = "generated_test_script.py"
+TIMINGS_NAME = "timings.json"
+# Runs the script and reports interpreter / browser start-up and test body timings
+BOOTSTRAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "script_bootstrap.py")
+
+# "subprocess": fresh interpreter + browser per run, "pooled": warm headless sessions (see driver_pool.py)
+EXECUTORS = ("subprocess", "pooled")
+DEFAULT_EXECUTOR = os.environ.get("QA_EXECUTOR", "subprocess")
+
+# Output is kept in a ring buffer, so a runaway script cannot exhaust memory
+MAX_OUTPUT_LINES = int(os.environ.get("QA_MAX_OUTPUT_LINES", "2000"))
+MAX_LINE_LENGTH = 4000
+
+
+@contextmanager
+def run_workspace(keep=False):
     """
-    Saves the generated code to a temporary file and executes it.
+    Creates a private directory for one execution:
+    - <workspace>/generated_test_script.py  (the script)
+    - <workspace>/profile                    (Chrome user-data-dir)
+    - <workspace>/artifacts                  (screenshots, logs, ...)
+    - <workspace>/tmp                        (TMPDIR, so Chrome's own temp files stay inside)
+    The directory is deleted afterwards unless `keep` is True.
+    """
+    workspace = tempfile.mkdtemp(prefix="qa_run_")
+    for name in ("profile", "artifacts", "tmp"):
+        os.makedirs(os.path.join(workspace, name))
+    try:
+        yield workspace
+    finally:
+        if not keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+def workspace_env(workspace, extra=None):
+    """
+    Environment for a script running inside `workspace` (plus any `extra` variables).
+    """
+    env = os.environ.copy()
+    tmp_dir = os.path.join(workspace, "tmp")
+    env.update({
+        "QA_RUN_DIR": workspace,
+        "QA_BROWSER_PROFILE_DIR": os.path.join(workspace, "profile"),
+        "QA_ARTIFACTS_DIR": os.path.join(workspace, "artifacts"),
+        # Flush print() line by line so output can be streamed
+        "PYTHONUNBUFFERED": "1",
+        "TMPDIR": tmp_dir,
+        "TEMP": tmp_dir,
+        "TMP": tmp_dir,
+    })
+    env.update(extra or {})
+    return env
+
+
+def execute_selenium_code(code_string, timeout=DEFAULT_TIMEOUT, cancel_event=None, keep_workspace=False,
+                          executor=None, pacing=None, target_html=None, run_preflight=None):
+    """
+    Saves the generated code into its own workspace (see run_workspace) and executes it.
+    Runs are fully isolated, so any number of them can execute concurrently.
+    `cancel_event` (a threading.Event) kills the run early when set.
+    `executor="pooled"` runs the script on a warm headless browser instead of a new one.
+    `pacing="fast"` strips the demo sleeps before running (see script_transform.make_fast).
+    `target_html` is registered with the local fixture server (see fixture_server.py) and its URL
+    is passed to the script as QA_TARGET_URL.
+    `run_preflight` runs the static pre-flight check first (see preflight.py; by default only when
+    `target_html` is given, to check the locators against it): a script with syntax errors,
+    forbidden imports or invalid locators is rejected without running.
     Returns a dictionary with:
     - success: Boolean
-    - output: Captured stdout
-    - error: Captured stderr
+    - status: "passed", "failed", "timeout", "cancelled", "rejected" or "error"
+    - output: Captured stdout (last MAX_OUTPUT_LINES lines)
+    - error: Captured stderr (last MAX_OUTPUT_LINES lines)
+    - workspace: Path of the kept workspace (only when keep_workspace=True)
+    - diagnostics: Pre-flight findings (only when the script was rejected)
+    - timings: Milliseconds spent in each phase of the run
     """
-    filename = "generated_test_script.py"
+    result = None
+    for event in stream_selenium_code(code_string, timeout=timeout, cancel_event=cancel_event,
+                                      keep_workspace=keep_workspace, executor=executor, pacing=pacing,
+                                      target_html=target_html, run_preflight=run_preflight):
+        if event["type"] == "result":
+            result = event["result"]
+    return result
+
 
+def stream_selenium_code(code_string, timeout=DEFAULT_TIMEOUT, cancel_event=None, keep_workspace=False,
+                         executor=None, pacing=None, target_html=None, run_preflight=None,
+                         max_lines=MAX_OUTPUT_LINES):
+    """
+    Same as execute_selenium_code, but yields the output while the script runs:
+    - {"type": "stdout" | "stderr", "line": str} for every line printed
+    - {"type": "result", "result": dict} once, at the end
+    The pooled executor captures output in-process, so its lines arrive when the test ends.
+    Every result carries "timings": milliseconds per phase (preflight, preprocess,
+    interpreter_spawn, browser_start, test_body, teardown, ... and total), see tracing.py.
+    """
+    executor = executor or DEFAULT_EXECUTOR
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTORS}")
+
+    timings = {}
+    started = time.perf_counter()
+    RUNS_IN_FLIGHT.inc()
     try:
-        # 1. Save the code to a file
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(code_string)
-
-        # 2. Run the file as a subprocess
-        # We use sys.executable to ensure we use the same Python environment (and dependencies) as the app
-        result = subprocess.run(
-            [sys.executable, filename],
-            capture_output=True,
-            text=True,
-            timeout=60  # Safety timeout (1 minute)
-        )
-
-        # 3. Return the results
-        return {
-            "success": result.returncode == 0,
-            "output": result.stdout,
-            "error": result.stderr
-        }
-
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "output": "",
-            "error": "Error: The test timed out (took longer than 60 seconds)."
-        }
+        for event in _stream_phases(code_string, timeout, cancel_event, keep_workspace, executor, pacing,
+                                    target_html, run_preflight, max_lines, timings):
+            if event["type"] == "result":
+                observe("total", time.perf_counter() - started, timings, executor=executor)
+                event["result"]["timings"] = timings
+                RUNS_TOTAL.inc(executor=executor, status=event["result"]["status"])
+            yield event
+    finally:
+        RUNS_IN_FLIGHT.dec()
+
+
+def preflight_rejection(code_string, target_html=None, run_preflight=None, timings=None):
+    """
+    Runs the static pre-flight check if `run_preflight` asks for it (by default: when `target_html`
+    is given). Returns the "rejected" result for a script that fails it, or None if it may run.
+    """
+    if run_preflight is None:
+        run_preflight = target_html is not None
+    if not run_preflight:
+        return None
+    with span("preflight", timings):
+        check = preflight(code_string, target_html)
+    if check["ok"]:
+        return None
+    return {
+        "success": False,
+        "status": "rejected",
+        "output": "",
+        "error": "Pre-flight check failed:\n" + format_diagnostics(check["diagnostics"]),
+        "diagnostics": check["diagnostics"]
+    }
+
+
+def _stream_phases(code_string, timeout, cancel_event, keep_workspace, executor, pacing, target_html,
+                   run_preflight, max_lines, timings):
+    rejection = preflight_rejection(code_string, target_html, run_preflight, timings)
+    if rejection is not None:
+        yield {"type": "result", "result": rejection}
+        return
+
+    with span("preprocess", timings):
+        extra_env = {}
+        if target_html:
+            from fixture_server import get_fixture_server
+            extra_env["QA_TARGET_URL"] = get_fixture_server().register(target_html)
+
+        code_string = apply_pacing(code_string, pacing)
+
+    if executor == "pooled":
+        from driver_pool import get_driver_pool
+        result = get_driver_pool().execute(code_string, timeout=timeout, cancel_event=cancel_event,
+                                           extra_env=extra_env, max_lines=max_lines)
+        timings.update(result.pop("timings", {}))
+        for stream in ("output", "error"):
+            for line in result[stream].splitlines(keepends=True):
+                yield {"type": "stdout" if stream == "output" else "stderr", "line": line}
+        yield {"type": "result", "result": result}
+        return
+
+    try:
+        with run_workspace(keep=keep_workspace) as workspace:
+            for event in _stream_in_workspace(code_string, workspace, timeout, cancel_event, max_lines,
+                                              extra_env, timings):
+                if event["type"] == "result" and keep_workspace:
+                    event["result"]["workspace"] = workspace
+                yield event
+
     except Exception as e:
-        return {
+        yield {"type": "result", "result": {
             "success": False,
+            "status": "error",
             "output": "",
             "error": f"System Error: {str(e)}"
-        }
\ No newline at end of file
+        }}
+
+
+class OutputBuffer:
+    """
+    Ring buffer of the last `max_lines` lines of one stream.
+    """
+
+    def __init__(self, max_lines=MAX_OUTPUT_LINES):
+        self.lines = deque(maxlen=max_lines)
+        self.total = 0
+
+    def append(self, line):
+        self.lines.append(line)
+        self.total += 1
+
+    def text(self):
+        dropped = self.total - len(self.lines)
+        prefix = f"[... {dropped} earlier lines dropped ...]\n" if dropped else ""
+        return prefix + "".join(self.lines)
+
+
+def _kill_tree(process):
+    """
+    Kills the script together with the chromedriver / Chrome processes it started.
+    """
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _pump(pipe, name, lines):
+    # Runs in a reader thread: forwards every line of `pipe` to the `lines` queue
+    # (overlong lines arrive in MAX_LINE_LENGTH pieces)
+    for line in iter(lambda: pipe.readline(MAX_LINE_LENGTH), ""):
+        lines.put((name, line))
+    pipe.close()
+    lines.put((name, None))
+
+
+def _stream_in_workspace(code_string, workspace, timeout, cancel_event, max_lines, extra_env=None, timings=None):
+    filename = os.path.join(workspace, SCRIPT_NAME)
+
+    # 1. Save the code to a file
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(code_string)
+
+    # 2. Run the file as a subprocess
+    # We use sys.executable to ensure we use the same Python environment (and dependencies) as the app
+    timings_file = os.path.join(workspace, TIMINGS_NAME)
+    env = workspace_env(workspace, extra_env)
+    env.update({"QA_TIMINGS_FILE": timings_file, "QA_SPAWN_TS": repr(time.time())})
+    process = subprocess.Popen(
+        [sys.executable, BOOTSTRAP, filename],
+        cwd=workspace,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        # Own process group, so a kill also takes down the browser it launched
+        start_new_session=(os.name == "posix")
+    )
+
+    # 3. Forward output line by line, checking for timeout / cancellation along the way
+    lines = queue.Queue()
+    for pipe, name in ((process.stdout, "stdout"), (process.stderr, "stderr")):
+        threading.Thread(target=_pump, args=(pipe, name, lines), daemon=True).start()
+
+    buffers = {"stdout": OutputBuffer(max_lines), "stderr": OutputBuffer(max_lines)}
+    open_streams = 2
+    status = None
+    deadline = time.monotonic() + timeout
+
+    try:
+        while open_streams:
+            if cancel_event is not None and cancel_event.is_set():
+                status = "cancelled"
+                break
+            if time.monotonic() >= deadline:
+                status = "timeout"
+                break
+            try:
+                name, line = lines.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if line is None:
+                open_streams -= 1
+                continue
+            buffers[name].append(line)
+            yield {"type": name, "line": line}
+
+        if status is None:
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                status = "timeout"
+    finally:
+        # 4. Make sure no browser outlives the script (it would keep the profile dir busy)
+        with span("teardown", timings):
+            _kill_tree(process)
+            process.wait()
+
+    # Phases measured inside the script's interpreter (missing if it was killed)
+    try:
+        with open(timings_file, "r", encoding="utf-8") as f:
+            for name, seconds in json.load(f).items():
+                observe(name, seconds, timings)
+    except (OSError, ValueError):
+        pass
+
+    # 5. Return the results
+    if status == "cancelled":
+        error = "Error: The test was cancelled."
+    elif status == "timeout":
+        error = f"Error: The test timed out (took longer than {timeout} seconds)."
+    else:
+        status = "passed" if process.returncode == 0 else "failed"
+        error = buffers["stderr"].text()
+
+    yield {"type": "result", "result": {
+        "success": status == "passed",
+        "status": status,
+        "output": buffers["stdout"].text(),
+        "error": error
+    }}
@@ -0,0 +1,57 @@
+"""
+Entry point the runner starts generated scripts with:
+
+    python script_bootstrap.py <script>
+
+Runs <script> as __main__ and writes a timing breakdown (interpreter start, browser
+start, test body) as JSON to QA_TIMINGS_FILE, for the parent process to report.
+For browser scripts, "interpreter_spawn" includes importing selenium.
+"""
+import json
+import os
+import runpy
+import sys
+import time
+
+
+def _patch_chrome(timings):
+    try:
+        from selenium import webdriver
+    except ImportError:
+        return
+
+    class TimedChrome(webdriver.Chrome):
+        def __init__(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                super().__init__(*args, **kwargs)
+            finally:
+                timings["browser_start"] += time.perf_counter() - started
+
+    webdriver.Chrome = TimedChrome
+
+
+def main():
+    spawned = float(os.environ.get("QA_SPAWN_TS", time.time()))
+    timings = {"browser_start": 0.0}
+    script = sys.argv[1]
+    with open(script, "r", encoding="utf-8", errors="replace") as f:
+        if "webdriver" in f.read():
+            _patch_chrome(timings)
+    timings["interpreter_spawn"] = max(0.0, time.time() - spawned)
+
+    sys.argv = sys.argv[1:]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+
+    started = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        timings["test_body"] = max(0.0, time.perf_counter() - started - timings["browser_start"])
+        if os.environ.get("QA_TIMINGS_FILE"):
+            with open(os.environ["QA_TIMINGS_FILE"], "w", encoding="utf-8") as f:
+                json.dump(timings, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import ast
+import copy
+import os
+
+# "demo": run the script as written, "fast": strip the demo sleeps (see make_fast)
+PACINGS = ("demo", "fast")
+DEFAULT_PACING = os.environ.get("QA_PACING", "demo")
+
+FAST_WAIT_TIMEOUT = 10   # Seconds an inserted WebDriverWait may block
+LOOP_SLEEP_CAP = 0.1     # Sleeps inside loops are polling, so they are shortened instead of removed
+
+INTERACTIONS = {"click", "send_keys", "clear", "submit"}
+DRIVER_CLASSES = {"Chrome", "Firefox", "Edge", "Safari", "Remote"}
+COMPOUND_STATEMENTS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try,
+                       ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Match)
+
+WAIT_ALIAS = "_qa_WebDriverWait"
+EC_ALIAS = "_qa_EC"
+
+
+def _sleep_names(tree):
+    """
+    Returns the call spellings that mean time.sleep in this module ("time.sleep", "sleep", ...).
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == "time":
+                    names.add(f"{alias.asname or 'time'}.sleep")
+        elif isinstance(node, ast.ImportFrom) and node.module == "time":
+            for alias in node.names:
+                if alias.name == "sleep":
+                    names.add(alias.asname or "sleep")
+    return names
+
+
+def _driver_name(tree):
+    """
+    Name of the variable holding the WebDriver (`driver = webdriver.Chrome()`), defaulting to "driver".
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+            func = node.value.func
+            called = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            target = node.targets[0]
+            if called in DRIVER_CLASSES and isinstance(target, ast.Name):
+                return target.id
+    return "driver"
+
+
+def _element_names(tree, driver):
+    """
+    Names that only ever hold a WebElement (every assignment is `name = driver.find_element(...)`).
+    Other receivers of click() / send_keys() (ActionChains, alerts, ...) get no element wait.
+    """
+    lookups, other = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, (ast.AnnAssign, ast.AugAssign, ast.For, ast.AsyncFor, ast.NamedExpr)):
+            targets, value = [node.target], None
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            targets, value = [item.optional_vars for item in node.items if item.optional_vars], None
+        else:
+            continue
+        is_lookup = (isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute)
+                     and value.func.attr == "find_element" and isinstance(value.func.value, ast.Name)
+                     and value.func.value.id == driver)
+        for target in targets:
+            if is_lookup and isinstance(target, ast.Name):
+                lookups.add(target.id)
+            else:
+                other.update(name.id for name in ast.walk(target) if isinstance(name, ast.Name))
+    return lookups - other
+
+
+def _is_sleep(stmt, sleep_names):
+    if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)):
+        return False
+    return ast.unparse(stmt.value.func) in sleep_names
+
+
+def _wait_for(stmt, driver, element_names):
+    """
+    Builds the WebDriverWait that should precede `stmt`, or None if it does not touch an element.
+    - driver.find_element(By.X, "v") -> wait until the locator is present (clickable if clicked)
+    - element.click() / send_keys()  -> wait until that element is clickable, if `element`
+      is one of `element_names` (see _element_names)
+    """
+    clicks = False
+    locator = None
+    element = None
+
+    for node in ast.walk(stmt):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+            continue
+        method = node.func.attr
+        receiver = node.func.value
+        if method in INTERACTIONS:
+            clicks = clicks or method == "click"
+            if element is None and isinstance(receiver, ast.Name) and receiver.id in element_names:
+                element = receiver
+        elif (method == "find_element" and locator is None and len(node.args) == 2
+              and isinstance(receiver, ast.Name) and receiver.id == driver):
+            locator = ast.Tuple(elts=[copy.deepcopy(arg) for arg in node.args], ctx=ast.Load())
+
+    if locator is not None:
+        condition = "element_to_be_clickable" if clicks else "presence_of_element_located"
+        argument = locator
+    elif element is not None:
+        condition = "element_to_be_clickable"
+        argument = ast.Name(id=element.id, ctx=ast.Load())
+    else:
+        return None
+
+    source = f"{WAIT_ALIAS}({driver}, {FAST_WAIT_TIMEOUT}).until({EC_ALIAS}.{condition}(ARG))"
+    wait = ast.parse(source).body[0]
+    wait.value.args[0].args[0] = argument
+    return wait
+
+
+class _FastPacing(ast.NodeTransformer):
+    def __init__(self, sleep_names, driver, element_names):
+        self.sleep_names = sleep_names
+        self.driver = driver
+        self.element_names = element_names
+        self.loop_depth = 0
+        self.removed = 0
+        self.waits = 0
+
+    def _rewrite_body(self, body):
+        new_body = []
+        pending_wait = False
+
+        for stmt in body:
+            if _is_sleep(stmt, self.sleep_names):
+                if self.loop_depth:
+                    stmt.value.args = [ast.Constant(LOOP_SLEEP_CAP)]
+                    stmt.value.keywords = []
+                    new_body.append(stmt)
+                else:
+                    self.removed += 1
+                    pending_wait = True
+                continue
+
+            stmt = self.visit(stmt)
+            if pending_wait:
+                if isinstance(stmt, COMPOUND_STATEMENTS):
+                    # Names inside a block may not exist yet, so don't hoist a wait above it
+                    pending_wait = False
+                else:
+                    wait = _wait_for(stmt, self.driver, self.element_names)
+                    if wait is not None:
+                        new_body.append(wait)
+                        self.waits += 1
+                        pending_wait = False
+            new_body.append(stmt)
+
+        return new_body or [ast.Pass()]
+
+    def generic_visit(self, node):
+        is_loop = isinstance(node, (ast.For, ast.AsyncFor, ast.While))
+        self.loop_depth += is_loop
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if isinstance(block, list) and block and isinstance(block[0], ast.stmt):
+                setattr(node, field, self._rewrite_body(block))
+        for handler in getattr(node, "handlers", []):
+            handler.body = self._rewrite_body(handler.body)
+        for case in getattr(node, "cases", []):
+            case.body = self._rewrite_body(case.body)
+        self.loop_depth -= is_loop
+        return node
+
+
+def _insert_imports(tree):
+    imports = ast.parse(
+        f"from selenium.webdriver.support.ui import WebDriverWait as {WAIT_ALIAS}\n"
+        f"from selenium.webdriver.support import expected_conditions as {EC_ALIAS}\n"
+    ).body
+
+    # Keep a module docstring and `from __future__` imports first
+    index = 0
+    for index, stmt in enumerate(tree.body):
+        is_docstring = index == 0 and isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)
+        is_future = isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__"
+        if not (is_docstring or is_future):
+            break
+    else:
+        index = len(tree.body)
+    tree.body[index:index] = imports
+
+
+def make_fast(code_string):
+    """
+    Removes the fixed `time.sleep()` pacing from a generated script.
+    Where a removed sleep guarded an element interaction, an explicit WebDriverWait is
+    inserted in front of it instead. Sleeps inside loops are shortened, not removed.
+    Returns a dictionary with:
+    - code: The rewritten script (unchanged if it does not parse)
+    - sleeps_removed: Number of sleeps stripped
+    - waits_added: Number of WebDriverWaits inserted
+    """
+    try:
+        tree = ast.parse(code_string)
+    except SyntaxError:
+        return {"code": code_string, "sleeps_removed": 0, "waits_added": 0}
+
+    sleep_names = _sleep_names(tree)
+    if not sleep_names:
+        return {"code": code_string, "sleeps_removed": 0, "waits_added": 0}
+
+    driver = _driver_name(tree)
+    transformer = _FastPacing(sleep_names, driver, _element_names(tree, driver))
+    tree.body = transformer._rewrite_body(tree.body)
+    if transformer.waits:
+        _insert_imports(tree)
+
+    return {
+        "code": ast.unparse(ast.fix_missing_locations(tree)),
+        "sleeps_removed": transformer.removed,
+        "waits_added": transformer.waits,
+    }
+
+
+def apply_pacing(code_string, pacing=None):
+    """
+    Returns the code to execute for the given pacing ("demo" or "fast").
+    """
+    pacing = pacing or DEFAULT_PACING
+    if pacing not in PACINGS:
+        raise ValueError(f"Unknown pacing '{pacing}', expected one of {PACINGS}")
+    if pacing == "demo":
+        return code_string
+    return make_fast(code_string)["code"]
@@ -0,0 +1,149 @@
+import asyncio
+import re
+from collections import OrderedDict
+
+from generation import fan_out, strip_code_fences
+from prompts import suite_prompt
+
+# Fixtures shared by every generated suite module. One browser and one page per module;
+# the page is served by the runner's fixture server (QA_TARGET_URL) or, when the module is
+# run on its own, read from the SUITE_PAGE_FILE saved next to the modules (one copy for every
+# feature), and reloaded (with storage/cookies wiped) between cases.
+SUITE_PAGE_FILE = "page.html"
+
+SUITE_HEADER = '''"""
+Generated test suite: {feature}
+All test cases share one browser and one loaded page; state is reset between cases.
+Run with `pytest {module}` or `python {module}`.
+"""
+import os
+import pathlib
+import sys
+
+import pytest
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+
+@pytest.fixture(scope="module")
+def page_url():
+    if os.environ.get("QA_TARGET_URL"):
+        return os.environ["QA_TARGET_URL"]
+    # Standalone run: the target page is saved next to the suite modules
+    page = pathlib.Path(__file__).resolve().with_name("{page_file}")
+    if not page.exists():
+        pytest.fail(f"Set QA_TARGET_URL or save the target page as {{page}}")
+    return page.as_uri()
+
+
+@pytest.fixture(scope="module")
+def browser(page_url):
+    options = Options()
+    if os.environ.get("QA_HEADLESS") == "1":
+        options.add_argument("--headless=new")
+    if os.environ.get("QA_BROWSER_PROFILE_DIR"):
+        options.add_argument("--user-data-dir=" + os.environ["QA_BROWSER_PROFILE_DIR"])
+    driver = webdriver.Chrome(options=options)
+    driver.get(page_url)
+    yield driver
+    driver.quit()
+
+
+@pytest.fixture
+def driver(browser, page_url):
+    yield browser
+    # Reset what this case left behind before the next one: storage, cookies, page state
+    browser.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    browser.delete_all_cookies()
+    browser.get(page_url)
+
+
+# --- GENERATED TEST CASES ---
+'''
+
+SUITE_FOOTER = '''
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([os.path.abspath(__file__), "-q", "-p", "no:cacheprovider", "--import-mode=importlib"]))
+'''
+
+
+def suite_module_name(feature):
+    """
+    "Discount Code" -> "test_discount_code.py"
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", feature.lower()).strip("_") or "feature"
+    return f"test_{slug}.py"
+
+
+def suite_module_names(features):
+    """
+    Returns {feature: module name}, numbering features whose names collide
+    ("Discount Code", "discount-code" -> "test_discount_code.py", "test_discount_code_2.py").
+    """
+    names = {}
+    taken = set()
+    for feature in features:
+        base = suite_module_name(feature)[:-len(".py")]
+        module, index = f"{base}.py", 1
+        while module in taken:
+            index += 1
+            module = f"{base}_{index}.py"
+        taken.add(module)
+        names[feature] = module
+    return names
+
+
+def _docstring_text(text):
+    # Keeps a feature name from ending the module docstring early (or starting an escape)
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def group_by_feature(test_cases):
+    """
+    Returns an ordered {Feature: [test cases]} dict (plan order is preserved).
+    """
+    groups = OrderedDict()
+    for test_case in test_cases:
+        groups.setdefault(test_case.get("Feature") or "General", []).append(test_case)
+    return groups
+
+
+def build_suite_module(feature, test_code, module=None):
+    """
+    Wraps LLM-written test functions in the shared fixture scaffold.
+    The page is not embedded: the module opens QA_TARGET_URL, or SUITE_PAGE_FILE next to it.
+    """
+    module = module or suite_module_name(feature)
+    header = SUITE_HEADER.format(feature=_docstring_text(feature), module=module, page_file=SUITE_PAGE_FILE)
+    return header + strip_code_fences(test_code) + "\n" + SUITE_FOOTER
+
+
+async def generate_suites_async(test_cases, page_elements, on_result=None, **kwargs):
+    """
+    Generates one pytest module per feature (see generation.fan_out for the concurrency options).
+    `on_result(module_name, code, error)` is called as soon as each module is done.
+    Returns {module_name: {"feature": str, "code": str or None, "error": str or None}}.
+    """
+    groups = list(group_by_feature(test_cases).items())
+    modules = suite_module_names(feature for feature, _ in groups)
+    results = {}
+
+    def collect(group, text, error):
+        feature, _ = group
+        module = modules[feature]
+        code = build_suite_module(feature, text, module) if text is not None else None
+        results[module] = {"feature": feature, "code": code, "error": error}
+        if on_result is not None:
+            on_result(module, code, error)
+
+    await fan_out(groups, lambda group: suite_prompt(group[0], group[1], page_elements),
+                  on_result=collect, **kwargs)
+    return results
+
+
+def generate_suites(test_cases, page_elements, **kwargs):
+    """
+    Blocking wrapper around generate_suites_async.
+    """
+    return asyncio.run(generate_suites_async(test_cases, page_elements, **kwargs))
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from runner import execute_selenium_code, preflight_rejection, DEFAULT_TIMEOUT, EXECUTORS
+from script_transform import apply_pacing, PACINGS
+
+DEFAULT_WORKERS = os.cpu_count() or 2
+
+
+def collect_scripts(paths):
+    """
+    Turns files and directories (all *.py inside, sorted) into a list of {"name", "code"} dicts.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, name) for name in sorted(names) if name.endswith(".py")]
+        else:
+            files.append(path)
+
+    scripts = []
+    for file_path in sorted(files):
+        with open(file_path, "r", encoding="utf-8") as f:
+            scripts.append({"name": os.path.relpath(file_path), "code": f.read()})
+    return scripts
+
+
+def shard(scripts, workers):
+    """
+    Splits the scripts round-robin into at most `workers` shards.
+    """
+    count = max(1, min(workers, len(scripts)))
+    return [scripts[index::count] for index in range(count)]
+
+
+def run_suite(scripts, workers=DEFAULT_WORKERS, executor="pooled", pacing="fast", timeout=DEFAULT_TIMEOUT,
+              on_result=None, target_html=None, run_preflight=None):
+    """
+    Runs the scripts in `workers` parallel shards and returns a report (see build_report).
+    With executor="pooled" every shard gets its own warm headless browser.
+    `target_html` is served to every script as QA_TARGET_URL (see fixture_server.py).
+    `run_preflight` rejects scripts that fail the static check without running them, with either
+    executor (see runner.preflight_rejection; by default when `target_html` is given).
+    `on_result(test_result)` is called as soon as each test finishes.
+    """
+    shards = shard(scripts, workers)
+    pool = None
+    if executor == "pooled" and scripts:
+        from driver_pool import DriverPool
+        pool = DriverPool(size=len(shards))
+    extra_env = None
+    if target_html is not None and pool is not None:
+        from fixture_server import get_fixture_server
+        extra_env = {"QA_TARGET_URL": get_fixture_server().register(target_html)}
+
+    def run_one(shard_index, script):
+        started = time.monotonic()
+        if pool is not None:
+            result = preflight_rejection(script["code"], target_html, run_preflight)
+            if result is None:
+                result = pool.execute(apply_pacing(script["code"], pacing), timeout=timeout, extra_env=extra_env)
+        else:
+            result = execute_selenium_code(script["code"], timeout=timeout, executor=executor, pacing=pacing,
+                                           target_html=target_html, run_preflight=run_preflight)
+        test = {
+            "name": script["name"],
+            "shard": shard_index,
+            "status": result["status"],
+            "success": result["success"],
+            "duration": round(time.monotonic() - started, 3),
+            "output": result["output"],
+            "error": result["error"],
+        }
+        if on_result is not None:
+            on_result(test)
+        return test
+
+    def run_shard(shard_index):
+        return [run_one(shard_index, script) for script in shards[shard_index]]
+
+    started = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=len(shards)) as threads:
+            tests = [test for shard_tests in threads.map(run_shard, range(len(shards))) for test in shard_tests]
+    finally:
+        if pool is not None:
+            pool.close()
+
+    return build_report(tests, wall_time=time.monotonic() - started, workers=len(shards))
+
+
+def build_report(tests, wall_time, workers):
+    """
+    Aggregates per-test results. The report is plain JSON-serializable data.
+    """
+    tests = sorted(tests, key=lambda test: test["name"])
+    failed = [test for test in tests if not test["success"]]
+    return {
+        "summary": {
+            "total": len(tests),
+            "passed": len(tests) - len(failed),
+            "failed": len(failed),
+            "workers": workers,
+            "wall_time": round(wall_time, 3),
+            "test_time": round(sum(test["duration"] for test in tests), 3),
+        },
+        "tests": tests,
+    }
+
+
+def rerun_failed(report, scripts, **kwargs):
+    """
+    Re-executes only the tests that failed in `report` and merges the new results into it.
+    `scripts` is the full list of {"name", "code"} dicts the report was produced from.
+    """
+    failed_names = {test["name"] for test in report["tests"] if not test["success"]}
+    retry = [script for script in scripts if script["name"] in failed_names]
+    if not retry:
+        return report
+
+    rerun = run_suite(retry, **kwargs)
+    merged = {test["name"]: test for test in report["tests"]}
+    for test in rerun["tests"]:
+        test["rerun"] = True
+        merged[test["name"]] = test
+
+    summary = report["summary"]
+    return build_report(list(merged.values()), wall_time=summary["wall_time"] + rerun["summary"]["wall_time"],
+                        workers=summary["workers"])
+
+
+def to_junit_xml(report, suite_name="qa-agent"):
+    """
+    Renders a report as a JUnit XML string (one <testcase> per script).
+    """
+    summary = report["summary"]
+    errors = sum(1 for test in report["tests"] if test["status"] in ("error", "timeout", "cancelled"))
+    suite = ET.Element("testsuite", {
+        "name": suite_name,
+        "tests": str(summary["total"]),
+        "failures": str(summary["failed"] - errors),
+        "errors": str(errors),
+        "time": str(summary["wall_time"]),
+    })
+
+    for test in report["tests"]:
+        case = ET.SubElement(suite, "testcase", {
+            "classname": f"{suite_name}.shard{test['shard']}",
+            "name": test["name"],
+            "time": str(test["duration"]),
+        })
+        if not test["success"]:
+            tag = "failure" if test["status"] == "failed" else "error"
+            message = test["error"].strip().splitlines()[-1] if test["error"].strip() else test["status"]
+            ET.SubElement(case, tag, {"message": message[:500], "type": test["status"]}).text = test["error"]
+        if test["output"]:
+            ET.SubElement(case, "system-out").text = test["output"]
+
+    return ET.tostring(suite, encoding="unicode")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run generated Selenium scripts as a parallel suite.")
+    parser.add_argument("paths", nargs="+", help="Script files and/or directories of scripts")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel shards (default: CPU count)")
+    parser.add_argument("--executor", choices=EXECUTORS, default="pooled")
+    parser.add_argument("--pacing", choices=PACINGS, default="fast")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="Per-test timeout in seconds")
+    parser.add_argument("--json", dest="json_path", default="suite_report.json", help="Where to write the JSON report")
+    parser.add_argument("--junit", dest="junit_path", default="suite_report.xml", help="Where to write JUnit XML")
+    parser.add_argument("--rerun-failed", action="store_true",
+                        help="Only re-run the tests that failed in the existing --json report")
+    args = parser.parse_args(argv)
+
+    scripts = collect_scripts(args.paths)
+    options = {"workers": args.workers, "executor": args.executor, "pacing": args.pacing, "timeout": args.timeout}
+
+    def print_result(test):
+        print(f"[{test['status'].upper():>9}] {test['name']} ({test['duration']:.2f}s)", flush=True)
+
+    if args.rerun_failed:
+        with open(args.json_path, "r", encoding="utf-8") as f:
+            report = rerun_failed(json.load(f), scripts, on_result=print_result, **options)
+    else:
+        report = run_suite(scripts, on_result=print_result, **options)
+
+    with open(args.json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(args.junit_path, "w", encoding="utf-8") as f:
+        f.write(to_junit_xml(report))
+
+    summary = report["summary"]
+    print(f"\n{summary['passed']}/{summary['total']} passed in {summary['wall_time']:.2f}s "
+          f"({summary['test_time']:.2f}s of test time on {summary['workers']} workers)")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+from driver_pool import CappedStream, _run_script
+from runner import MAX_LINE_LENGTH
+
+
+def test_capped_stream_keeps_the_last_lines():
+    stream = CappedStream(max_lines=3)
+
+    for index in range(10):
+        stream.write(f"line {index}\n")
+    stream.write("no newline yet")
+
+    output = stream.getvalue()
+    assert output.endswith("line 7\nline 8\nline 9\nno newline yet")
+    assert "line 6\n" not in output
+    assert "7 earlier lines dropped" in output
+
+
+def test_capped_stream_splits_overlong_lines():
+    stream = CappedStream(max_lines=2)
+
+    stream.write("x" * (MAX_LINE_LENGTH * 3) + "\n")
+
+    assert len(stream.getvalue()) < MAX_LINE_LENGTH * 2 + 100
+
+
+def test_run_script_caps_output_in_the_worker(tmp_path):
+    # The driver is never touched by a script that does not use it
+    result = _run_script(object(), "for i in range(1000):\n    print(i)\n", {}, str(tmp_path), max_lines=5)
+
+    assert result["success"]
+    assert result["output"].endswith("995\n996\n997\n998\n999\n")
+    assert "\n994\n" not in result["output"]
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from jobs import CANCELLED, RUNNING, JobQueue, QueueFullError
+
+
+class BlockingExecute:
+    """
+    Stands in for execute_selenium_code: runs until released or cancelled.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, code, timeout=None, cancel_event=None, **options):
+        self.started.set()
+        while not self.release.wait(0.01):
+            if cancel_event.is_set():
+                return {"success": False, "status": CANCELLED, "output": "", "error": "killed"}
+        return {"success": True, "status": "passed", "output": code, "error": ""}
+
+
+@pytest.fixture
+def execute():
+    return BlockingExecute()
+
+
+@pytest.fixture
+def jobs(execute):
+    queue = JobQueue(max_workers=1, max_queue_depth=2, execute=execute)
+    queue.start()
+    yield queue
+    execute.release.set()
+    queue.shutdown()
+
+
+def test_full_queue_rejects_new_jobs(jobs, execute):
+    running = jobs.submit("running")
+    assert execute.started.wait(2)
+    waiting = [jobs.submit("queued 1"), jobs.submit("queued 2")]
+
+    with pytest.raises(QueueFullError):
+        jobs.submit("one too many")
+
+    assert jobs.stats() == {"workers": 1, "queue_depth": 2, "max_queue_depth": 2, "running": 1}
+    execute.release.set()
+    for job in [running] + waiting:
+        assert job.wait(2)
+        assert job.result["output"] == job.code
+
+
+def test_cancel_queued_job(jobs, execute):
+    jobs.submit("running")
+    assert execute.started.wait(2)
+    queued = jobs.submit("queued")
+
+    assert jobs.cancel(queued.id) is queued
+    assert queued.wait(0)
+    assert queued.status == CANCELLED
+
+    execute.release.set()
+    follow_up = jobs.submit("after")
+    assert follow_up.wait(2)
+    assert queued.result["output"] == ""
+
+
+def test_cancel_running_job(jobs, execute):
+    job = jobs.submit("running")
+    assert execute.started.wait(2)
+    assert job.status == RUNNING
+
+    jobs.cancel(job.id)
+
+    assert job.wait(2)
+    assert job.status == CANCELLED
+
+
+def test_cancel_unknown_job():
+    assert JobQueue(max_workers=1).cancel("missing") is None
+
+
+def test_executor_exception_finishes_the_job():
+    def broken(code, **options):
+        raise RuntimeError("driver crashed")
+
+    jobs = JobQueue(max_workers=1, execute=broken)
+    jobs.start()
+    try:
+        job = jobs.submit("print(1)", executor="pool")
+        assert job.wait(2)
+    finally:
+        jobs.shutdown()
+
+    assert job.status == "error"
+    assert "driver crashed" in job.result["error"]
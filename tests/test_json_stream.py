@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from json_stream import JsonArrayParser, iter_array_items
+
+PLAN = [
+    {"id": "TC001", "title": "Valid code", "steps": ["Type \"SAVE15\"", "Click {Apply}"]},
+    {"id": "TC002", "title": "Back\\slash ] and [ brackets", "data": {"nested": [1, 2]}},
+]
+
+
+def _chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_items_survive_any_chunk_split(size):
+    text = "```json\n" + json.dumps(PLAN, indent=2) + "\n```"
+
+    items = list(iter_array_items(_chunked(text, size)))
+
+    assert items == [(0, PLAN[0], None), (1, PLAN[1], None)]
+
+
+def test_item_is_returned_as_soon_as_it_closes():
+    parser = JsonArrayParser()
+
+    assert parser.feed('Here is the plan:\n[{"id": "TC001", "note": "a } in') == []
+    assert parser.feed(' a string"}, {"id"') == [(0, {"id": "TC001", "note": "a } in a string"}, None)]
+    assert parser.feed(': "TC002"}]') == [(1, {"id": "TC002"}, None)]
+    assert parser.close() == []
+
+
+def test_escaped_quote_does_not_end_the_string():
+    parser = JsonArrayParser()
+
+    items = parser.feed('[{"title": "say \\"hi\\"\\\\"}, {"title": "x"}]')
+
+    assert items == [(0, {"title": 'say "hi"\\'}, None), (1, {"title": "x"}, None)]
+
+
+def test_invalid_item_is_reported_alone():
+    items = list(iter_array_items(['[{"id": 1}, {"id": 2,}, "text", {"id": 3}]']))
+
+    assert [(index, value) for index, value, _ in items] == [(0, {"id": 1}), (1, None), (2, None), (3, {"id": 3})]
+    assert items[1][2].startswith("Invalid JSON")
+    assert items[2][2].startswith("Expected an object, got str")
+
+
+def test_text_after_the_array_is_ignored():
+    assert list(iter_array_items(['[{"id": 1}]\nLet me know if you need more [tests].'])) == [(0, {"id": 1}, None)]
+
+
+def test_cut_off_item_is_an_error_on_close():
+    parser = JsonArrayParser()
+
+    assert parser.feed('[{"id": 1}, {"id": 2, "title": "unfini') == [(0, {"id": 1}, None)]
+    assert parser.close() == [(1, None, "Incomplete item at the end of the response")]
+
+
+def test_response_without_an_array_raises():
+    parser = JsonArrayParser()
+    parser.feed("Sorry, I can't help with that.")
+
+    with pytest.raises(ValueError):
+        parser.close()
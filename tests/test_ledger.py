@@ -0,0 +1,99 @@
+import pytest
+
+from ledger import ExecutionLedger, execute_with_ledger, grounded_sources, run_key
+from runner import DEFAULT_EXECUTOR
+from script_transform import DEFAULT_PACING
+
+HASHES = {"docs/product_specs.md": "aaa", "docs/ui_ux_guide.txt": "bbb"}
+
+
+class FakeExecute:
+    def __init__(self, success=True):
+        self.success = success
+        self.calls = []
+
+    def __call__(self, code, **options):
+        self.calls.append(options)
+        status = "passed" if self.success else "failed"
+        return {"success": self.success, "status": status, "output": "ran\n", "error": ""}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ExecutionLedger(str(tmp_path / "ledger.sqlite3"))
+
+
+def test_grounded_sources_resolve_by_basename():
+    sources = grounded_sources("product_specs.md, notes.md", HASHES)
+
+    assert sources == {"docs/product_specs.md": "aaa", "notes.md": None}
+
+
+def test_run_key_changes_with_everything_a_run_depends_on():
+    sources = grounded_sources("product_specs.md", HASHES)
+    key = run_key("print(1)", "<html>", sources)
+
+    assert key == run_key("print(1)", "<html>", dict(sources))
+    assert key != run_key("print(2)", "<html>", sources)
+    assert key != run_key("print(1)", "<html><p>", sources)
+    assert key != run_key("print(1)", "<html>", grounded_sources("product_specs.md", {**HASHES, "docs/product_specs.md": "ccc"}))
+    assert run_key("print(1)", "<html>", sources, pacing="fast") != run_key("print(1)", "<html>", sources, pacing="demo")
+    assert (run_key("print(1)", "<html>", sources, executor="subprocess")
+            != run_key("print(1)", "<html>", sources, executor="pooled"))
+
+
+def test_run_key_fills_in_the_default_run_options():
+    assert run_key("print(1)", "<html>", {}) == run_key("print(1)", "<html>", {}, DEFAULT_EXECUTOR, DEFAULT_PACING)
+
+
+def test_unchanged_passing_run_is_skipped(ledger):
+    execute = FakeExecute()
+
+    first = execute_with_ledger("print(1)", "<html>", "product_specs.md", HASHES, ledger=ledger, execute=execute)
+    second = execute_with_ledger("print(1)", "<html>", "product_specs.md", HASHES, ledger=ledger, execute=execute)
+
+    assert len(execute.calls) == 1
+    assert "skipped" not in first
+    assert second["skipped"] and second["success"] and second["output"] == "ran\n"
+
+
+def test_changed_grounded_source_reruns(ledger):
+    execute = FakeExecute()
+    execute_with_ledger("print(1)", "<html>", "product_specs.md", HASHES, ledger=ledger, execute=execute)
+
+    # A source the test is not grounded in does not matter
+    execute_with_ledger("print(1)", "<html>", "product_specs.md", {**HASHES, "docs/ui_ux_guide.txt": "new"},
+                        ledger=ledger, execute=execute)
+    assert len(execute.calls) == 1
+
+    result = execute_with_ledger("print(1)", "<html>", "product_specs.md", {**HASHES, "docs/product_specs.md": "new"},
+                                 ledger=ledger, execute=execute)
+    assert len(execute.calls) == 2
+    assert "skipped" not in result
+
+
+def test_run_options_are_passed_through_and_keyed(ledger):
+    execute = FakeExecute()
+    execute_with_ledger("print(1)", "<html>", "", {}, ledger=ledger, execute=execute, pacing="fast")
+    execute_with_ledger("print(1)", "<html>", "", {}, ledger=ledger, execute=execute, pacing="demo")
+
+    assert execute.calls == [{"pacing": "fast"}, {"pacing": "demo"}]
+
+
+def test_failures_are_never_reused(ledger):
+    execute = FakeExecute(success=False)
+
+    for _ in range(2):
+        result = execute_with_ledger("print(1)", "<html>", "", {}, ledger=ledger, execute=execute)
+
+    assert len(execute.calls) == 2
+    assert result["status"] == "failed"
+
+
+def test_only_affected_false_always_runs(ledger):
+    execute = FakeExecute()
+
+    for _ in range(2):
+        execute_with_ledger("print(1)", "<html>", "", {}, ledger=ledger, execute=execute, only_affected=False)
+
+    assert len(execute.calls) == 2
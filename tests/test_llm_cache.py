@@ -0,0 +1,67 @@
+import pytest
+
+from generation import StubModel, StubResponse
+from llm_cache import CachedModel, LLMCache
+
+
+class CountingModel(StubModel):
+    def __init__(self, text=None):
+        super().__init__(latency=0)
+        self.text = text
+        self.calls = 0
+
+    def _respond(self, prompt):
+        self.calls += 1
+        return StubResponse(self.text) if self.text is not None else super()._respond(prompt)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(str(tmp_path / "llm.sqlite3"))
+
+
+def test_repeated_prompt_is_answered_from_the_cache(cache):
+    model = CountingModel()
+    cached = CachedModel(model, cache)
+
+    first = cached.generate_content("write a script")
+    second = cached.generate_content("write a script  \r\n")
+
+    assert model.calls == 1
+    assert not first.cached and second.cached
+    assert second.text == first.text
+
+
+def test_stream_and_regular_calls_share_entries(cache):
+    model = CountingModel()
+    cached = CachedModel(model, cache)
+
+    streamed = "".join(chunk.text for chunk in cached.generate_content("write a script", stream=True))
+    response = cached.generate_content("write a script")
+
+    assert model.calls == 1
+    assert response.cached and response.text == streamed
+
+
+def test_refresh_regenerates_and_replaces_the_entry(cache):
+    model = CountingModel("old")
+    CachedModel(model, cache).generate_content("plan")
+
+    model.text = "new"
+    regenerated = CachedModel(model, cache, refresh=True).generate_content("plan")
+    replayed = CachedModel(model, cache).generate_content("plan")
+
+    assert model.calls == 2
+    assert not regenerated.cached and regenerated.text == "new"
+    assert replayed.cached and replayed.text == "new"
+
+
+def test_empty_answers_are_not_stored(cache):
+    model = CountingModel("")
+    cached = CachedModel(model, cache)
+
+    cached.generate_content("plan")
+    list(cached.generate_content("plan", stream=True))
+    cached.generate_content("plan")
+
+    assert model.calls == 3
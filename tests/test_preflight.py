@@ -0,0 +1,84 @@
+from preflight import extract_locators, format_diagnostics, preflight
+
+HTML = """<html><body>
+<input id="promo_code" name="promo" class="field wide">
+<button id="apply_btn">Apply</button>
+<div id="promo_message"></div>
+<a href="/help">Need help?</a>
+</body></html>"""
+
+HEADER = "from selenium.webdriver.common.by import By\n"
+
+
+def _levels(check):
+    return [(d["line"], d["level"]) for d in check["diagnostics"]]
+
+
+def test_clean_script_passes():
+    code = HEADER + 'driver.find_element(By.ID, "promo_code")\ndriver.find_element(By.LINK_TEXT, "Need help?")\n'
+
+    check = preflight(code, HTML)
+
+    assert check["ok"]
+    assert check["diagnostics"] == []
+    assert [locator["matches"] for locator in check["locators"]] == [1, 1]
+
+
+def test_forbidden_import_is_an_error():
+    check = preflight("import socket\nfrom selenium import webdriver\nimport os.path\n")
+
+    assert not check["ok"]
+    assert _levels(check) == [(1, "error")]
+    assert "socket" in check["diagnostics"][0]["message"]
+
+
+def test_syntax_error_and_fences_are_errors():
+    check = preflight("```python\nprint('x'\n```\n")
+
+    assert not check["ok"]
+    assert {d["level"] for d in check["diagnostics"]} == {"error"}
+    assert any("SyntaxError" in d["message"] for d in check["diagnostics"])
+    assert sum("code fence" in d["message"] for d in check["diagnostics"]) == 2
+
+
+def test_locator_added_at_run_time_is_only_a_warning():
+    code = HEADER + ("driver.find_element(By.XPATH, "
+                     "\"//div[@id='promo_message' and contains(text(),'Invalid Coupon')]\")\n")
+
+    check = preflight(code, HTML)
+
+    assert check["ok"]
+    assert _levels(check) == [(2, "warning")]
+    assert check["locators"][0]["matches"] == 0
+
+
+def test_invalid_selectors_are_errors():
+    code = HEADER + ('driver.find_element(By.XPATH, "//div[")\n'
+                     'driver.find_element(By.CLASS_NAME, "field wide")\n')
+
+    check = preflight(code, HTML)
+
+    assert not check["ok"]
+    assert _levels(check) == [(2, "error"), (3, "error")]
+
+
+def test_locators_are_not_checked_without_html():
+    check = preflight(HEADER + 'driver.find_element(By.ID, "missing")\n')
+
+    assert check["ok"]
+    assert "matches" not in check["locators"][0]
+
+
+def test_extract_locators_covers_wait_tuples():
+    import ast
+
+    tree = ast.parse(HEADER + 'EC.presence_of_element_located((By.CSS_SELECTOR, "#apply_btn"))\n'
+                              'driver.find_element(By.NAME, variable)\n')
+
+    assert [(loc["strategy"], loc["value"]) for loc in extract_locators(tree)] == [("CSS_SELECTOR", "#apply_btn")]
+
+
+def test_format_diagnostics():
+    text = format_diagnostics([{"level": "error", "line": 3, "message": "boom"}])
+
+    assert text == "line 3: [error] boom"
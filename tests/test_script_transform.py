@@ -0,0 +1,80 @@
+import ast
+
+import pytest
+
+from script_transform import WAIT_ALIAS, apply_pacing, make_fast
+
+SCRIPT = '''import time
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+driver = webdriver.Chrome()
+driver.get("file:///page.html")
+time.sleep(2)
+driver.find_element(By.ID, "promo_code").send_keys("SAVE20")
+time.sleep(1)
+button = driver.find_element(By.ID, "apply_btn")
+time.sleep(1)
+button.click()
+'''
+
+
+def _calls(code, name):
+    return [node for node in ast.walk(ast.parse(code))
+            if isinstance(node, ast.Call) and ast.unparse(node.func).endswith(name)]
+
+
+def test_fast_pacing_replaces_sleeps_with_waits():
+    result = make_fast(SCRIPT)
+
+    assert result["sleeps_removed"] == 3
+    assert result["waits_added"] == 3
+    assert not _calls(result["code"], "sleep")
+    assert f"import WebDriverWait as {WAIT_ALIAS}" in result["code"]
+
+
+def test_wait_targets_the_next_interaction():
+    code = make_fast(SCRIPT)["code"]
+
+    assert "presence_of_element_located((By.ID, 'promo_code'))" in code
+    assert "presence_of_element_located((By.ID, 'apply_btn'))" in code
+    # A name bound to find_element is waited on directly before it is clicked
+    assert "element_to_be_clickable(button)" in code
+
+
+def test_non_element_receivers_get_no_wait():
+    code = SCRIPT + "time.sleep(1)\nActionChains(driver).click()\nalert = driver.switch_to.alert\n" \
+                    "time.sleep(1)\nalert.send_keys('x')\n"
+
+    result = make_fast(code)
+
+    assert result["sleeps_removed"] == 5
+    assert result["waits_added"] == 3
+
+
+def test_sleeps_in_loops_are_shortened():
+    code = "import time\nfor _ in range(3):\n    time.sleep(5)\n"
+
+    result = make_fast(code)
+
+    assert result["sleeps_removed"] == 0
+    assert "time.sleep(0.1)" in result["code"]
+
+
+def test_aliased_sleep_is_recognized():
+    result = make_fast("from time import sleep as pause\npause(3)\nprint('done')\n")
+
+    assert result["sleeps_removed"] == 1
+    assert not _calls(result["code"], "pause")
+
+
+def test_unparsable_script_is_left_alone():
+    code = "time.sleep(1\n"
+
+    assert make_fast(code) == {"code": code, "sleeps_removed": 0, "waits_added": 0}
+
+
+def test_apply_pacing():
+    assert apply_pacing(SCRIPT, "demo") == SCRIPT
+    assert apply_pacing(SCRIPT, "fast") == make_fast(SCRIPT)["code"]
+    with pytest.raises(ValueError):
+        apply_pacing(SCRIPT, "warp")
@@ -0,0 +1,51 @@
+import ast
+
+from generation import StubModel
+from suite_generation import SUITE_PAGE_FILE, build_suite_module, generate_suites, suite_module_names
+
+CASES = [
+    {"Test_ID": "TC-001", "Feature": "Discount Code", "Test_Scenario": "Valid code"},
+    {"Test_ID": "TC-002", "Feature": "discount-code", "Test_Scenario": "Expired code"},
+    {"Test_ID": "TC-003", "Feature": "Shipping", "Test_Scenario": "Express shipping"},
+    {"Test_ID": "TC-004", "Feature": "Discount Code", "Test_Scenario": "Invalid code"},
+]
+
+
+def test_colliding_feature_names_get_distinct_modules():
+    names = suite_module_names(["Discount Code", "discount-code", "Discount code 2", "x"])
+
+    assert names == {
+        "Discount Code": "test_discount_code.py",
+        "discount-code": "test_discount_code_2.py",
+        "Discount code 2": "test_discount_code_2_2.py",
+        "x": "test_x.py",
+    }
+
+
+def test_feature_name_cannot_break_the_module_docstring():
+    feature = 'Say """hi""" \\ then quit'
+
+    code = build_suite_module(feature, "def test_ok(driver):\n    pass\n")
+
+    assert feature in ast.get_docstring(ast.parse(code))
+
+
+def test_module_opens_the_page_file_instead_of_embedding_it():
+    code = build_suite_module("Shipping", "```python\ndef test_ok(driver):\n    pass\n```")
+
+    tree = ast.parse(code)
+    functions = {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}
+    assert {"page_url", "browser", "driver", "test_ok"} <= functions
+    assert SUITE_PAGE_FILE in code
+    assert "<html" not in code.lower()
+    assert "```" not in code
+
+
+def test_generate_suites_builds_one_module_per_feature():
+    results = generate_suites(CASES, "<button id='apply_btn'>", model=StubModel(latency=0))
+
+    assert sorted(results) == ["test_discount_code.py", "test_discount_code_2.py", "test_shipping.py"]
+    for module, result in results.items():
+        assert result["error"] is None
+        ast.parse(result["code"])
+    assert results["test_discount_code_2.py"]["feature"] == "discount-code"
@@ -0,0 +1,181 @@
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("qa.trace")
+
+# Seconds; from a DOM lookup to a slow browser test
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=SPAN_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_number(bound))])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]!r}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(self._values.items())]
+        return lines
+
+
+class Gauge:
+    """
+    A value that goes up and down, or, with `callback`, is read when the metrics are scraped.
+    """
+
+    def __init__(self, name, documentation, callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def value(self):
+        if self.callback is not None:
+            return self.callback()
+        with self._lock:
+            return self._value
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.value()}"]
+
+
+class MetricsRegistry:
+    """
+    Process-wide collection of metrics, rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, documentation, buckets=SPAN_BUCKETS):
+        return self._register(Histogram(name, documentation, buckets))
+
+    def counter(self, name, documentation):
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name, documentation, callback=None):
+        gauge = self._register(Gauge(name, documentation))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram("qa_span_duration_seconds", "Duration of pipeline phases.")
+LLM_TOKENS = registry.histogram("qa_llm_tokens", "Tokens per LLM call.", buckets=TOKEN_BUCKETS)
+RUNS_IN_FLIGHT = registry.gauge("qa_runs_in_flight", "Script executions currently running.")
+RUNS_TOTAL = registry.counter("qa_runs_total", "Finished script executions.")
+
+
+def observe(name, seconds, timings=None, **attributes):
+    """
+    Records an already measured phase: histogram, debug log line and, if given,
+    `timings[name]` (milliseconds, summed when a phase repeats).
+    """
+    SPAN_SECONDS.observe(seconds, span=name)
+    milliseconds = round(seconds * 1000, 2)
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + milliseconds, 2)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({"span": name, "ms": milliseconds, **attributes}, default=str))
+
+
+@contextmanager
+def span(name, timings=None, **attributes):
+    """
+    Times the enclosed block (see observe). Yields the attributes dict, so the block can
+    add details such as token counts to the log record.
+    """
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        observe(name, time.perf_counter() - started, timings, **attributes)
+
+
+def record_llm_tokens(prompt_tokens, response_tokens, model=""):
+    LLM_TOKENS.observe(prompt_tokens, kind="prompt", model=model)
+    LLM_TOKENS.observe(response_tokens, kind="response", model=model)
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+# Shards up to this many vectors use an exact flat index; bigger ones switch to INDEX_KIND
+FLAT_MAX = int(os.environ.get("QA_INDEX_FLAT_MAX", "20000"))
+INDEX_KIND = os.environ.get("QA_INDEX_KIND", "hnsw")  # "hnsw" or "ivfpq"
+# Metadata field that splits a corpus into shards ("source", "project", a feature tag, ...)
+SHARD_BY = os.environ.get("QA_SHARD_BY", "source")
+# Corpora smaller than this stay in a single shard, however many distinct SHARD_BY values they have
+SHARD_MIN_VECTORS = int(os.environ.get("QA_SHARD_MIN_VECTORS", "5000"))
+MMAP = os.environ.get("QA_INDEX_MMAP", "1") == "1"
+
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+FETCH_K = 20  # Candidates per shard when a filter may discard some of them
+
+DOCS_FILE = "docs.sqlite3"
+META_FILE = "shards.json"
+ALL_SHARD = "_all"
+
+
+def _faiss():
+    import faiss
+    return faiss
+
+
+def _shard_dir(name):
+    # Readable, and unique even when two names only differ in characters that get replaced
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)[:60] or "_"
+    return f"{slug}-{hashlib.sha256(name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _pq_subquantizers(dim):
+    # 4-16 dimensions per sub-quantizer, with `dim` divisible by the count
+    for count in (dim // 8, dim // 4, dim // 16, dim // 2):
+        if count and dim % count == 0:
+            return count
+    return 1
+
+
+def build_index(vectors, kind=None):
+    """
+    FAISS index for `vectors` (float32, n x d): exact (flat) up to FLAT_MAX vectors,
+    otherwise HNSW or IVF-PQ (`kind`, default QA_INDEX_KIND).
+    """
+    faiss = _faiss()
+    count, dim = vectors.shape
+    kind = kind or INDEX_KIND
+    if count <= FLAT_MAX:
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "ivfpq":
+        nlist = max(1, min(int(4 * math.sqrt(count)), count // 39))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, _pq_subquantizers(dim), 8)
+        sample = vectors[np.random.default_rng(0).choice(count, min(count, nlist * 256), replace=False)]
+        index.train(sample)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+    else:
+        raise ValueError(f"Unknown index kind '{kind}', expected 'hnsw' or 'ivfpq'")
+    index.add(vectors)
+    return index
+
+
+def _tune(index):
+    faiss = _faiss()
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = IVF_NPROBE
+    return index
+
+
+def _mmap_flags(kind):
+    """
+    read_index flags that memory-map a shard of the given index class name, or 0 if this FAISS
+    cannot map it. IO_FLAG_MMAP only maps IVF inverted lists; flat codes (IndexFlat, HNSW
+    storage) need IO_FLAG_MMAP_IFC (FAISS >= 1.8), and the two cannot be combined.
+    """
+    faiss = _faiss()
+    if kind.startswith("IndexIVF"):
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+    return 0
+
+
+def _resident_bytes(index):
+    """
+    Memory a shard holds beyond its (mapped) index file: IVF-PQ computes an nlist x M x ksub
+    distance table when it is loaded.
+    """
+    faiss = _faiss()
+    if isinstance(index, faiss.IndexIVFPQ) and index.by_residual:
+        return index.nlist * index.pq.M * index.pq.ksub * 4
+    return 0
+
+
+def _matches(metadata, filter):
+    for key, wanted in (filter or {}).items():
+        values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+        if metadata.get(key) not in values:
+            return False
+    return True
+
+
+class ShardedIndex(VectorStore):
+    """
+    Read-only, on-disk vector store made of one FAISS index per shard.
+
+    - Shards split the corpus by a metadata field (SHARD_BY); a filter on that field only
+      searches the matching shards, other filters are applied to the candidates.
+    - Each shard picks its own index type (see build_index), so big shards stay fast.
+    - Index files are memory-mapped and chunk texts live in SQLite, so resident memory
+      does not grow with the corpus.
+    """
+
+    def __init__(self, path, embeddings, mmap=MMAP):
+        self.path = path
+        self._embeddings = embeddings
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.shard_by = meta["shard_by"]
+        self.shards = meta["shards"]  # name -> {"dir", "count", "kind"}
+        self.mmap = mmap
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, DOCS_FILE), check_same_thread=False)
+
+    # --- BUILD ---
+    @staticmethod
+    def write(path, texts, vectors, metadatas, ids, shard_by=SHARD_BY, kind=None):
+        """
+        Writes a sharded index for the given chunks to `path` (open it with ShardedIndex(path, ...)).
+        """
+        vectors = np.asarray(vectors, dtype="float32")
+        os.makedirs(path, exist_ok=True)
+
+        groups = {}
+        if len(texts) < SHARD_MIN_VECTORS:
+            groups[ALL_SHARD] = list(range(len(texts)))
+        else:
+            for position, metadata in enumerate(metadatas):
+                groups.setdefault(str(metadata.get(shard_by, "")), []).append(position)
+
+        faiss = _faiss()
+        conn = sqlite3.connect(os.path.join(path, DOCS_FILE))
+        conn.execute("CREATE TABLE docs (shard TEXT, pos INTEGER, id TEXT, text TEXT, metadata TEXT, "
+                     "PRIMARY KEY (shard, pos))")
+        shards = {}
+        for name, positions in groups.items():
+            directory = _shard_dir(name)
+            os.makedirs(os.path.join(path, directory), exist_ok=True)
+            index = build_index(vectors[positions], kind)
+            faiss.write_index(index, os.path.join(path, directory, "index.faiss"))
+            conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?)", [
+                (name, shard_pos, ids[position], texts[position], json.dumps(metadatas[position]))
+                for shard_pos, position in enumerate(positions)])
+            shards[name] = {"dir": directory, "count": len(positions), "kind": type(index).__name__,
+                            "resident_bytes": _resident_bytes(index)}
+        conn.commit()
+        conn.close()
+
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"shard_by": shard_by if len(groups) > 1 or ALL_SHARD not in groups else None,
+                       "shards": shards}, f, indent=2)
+
+    @staticmethod
+    def write_faiss(path, vector_db, **kwargs):
+        """
+        Writes the content of a LangChain FAISS store (flat index) as a ShardedIndex at `path`.
+        """
+        index = vector_db.index
+        vectors = index.reconstruct_n(0, index.ntotal)
+        ids = [vector_db.index_to_docstore_id[position] for position in range(index.ntotal)]
+        docs = [vector_db.docstore.search(doc_id) for doc_id in ids]
+        ShardedIndex.write(path, [doc.page_content for doc in docs], vectors, [doc.metadata for doc in docs], ids,
+                           **kwargs)
+
+    # --- SEARCH ---
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    def __len__(self):
+        return sum(shard["count"] for shard in self.shards.values())
+
+    def _index(self, name):
+        with self._lock:
+            index = self._indexes.get(name)
+            if index is None:
+                faiss = _faiss()
+                flags = _mmap_flags(self.shards[name]["kind"]) if self.mmap else 0
+                file_path = os.path.join(self.path, self.shards[name]["dir"], "index.faiss")
+                index = self._indexes[name] = _tune(faiss.read_index(file_path, flags))
+            return index
+
+    def _shards_for(self, filter):
+        if self.shard_by and filter and self.shard_by in filter:
+            wanted = filter[self.shard_by]
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            return [name for name in self.shards if name in {str(value) for value in wanted}]
+        return list(self.shards)
+
+    def similarity_search_with_score_by_vectors(self, embeddings, k=4, filter=None, fetch_k=FETCH_K):
+        """
+        Searches many query vectors at once (one FAISS call per shard for all of them).
+        Returns one [(Document, distance)] list per query, nearest first.
+        """
+        queries = np.asarray(embeddings, dtype="float32").reshape(len(embeddings), -1)
+        candidates = [[] for _ in range(len(queries))]
+        for name in self._shards_for(filter):
+            distances, positions = self._index(name).search(queries, max(k, fetch_k) if filter else k)
+            for query, (row_distances, row_positions) in enumerate(zip(distances, positions)):
+                candidates[query] += [(float(distance), name, int(position))
+                                      for distance, position in zip(row_distances, row_positions) if position >= 0]
+
+        results = []
+        for query_candidates in candidates:
+            query_candidates.sort()
+            docs = []
+            for distance, name, position in query_candidates:
+                row = self._conn.execute("SELECT id, text, metadata FROM docs WHERE shard = ? AND pos = ?",
+                                         (name, position)).fetchone()
+                doc_id, text, metadata = row
+                metadata = json.loads(metadata)
+                if not _matches(metadata, filter):
+                    continue
+                docs.append((Document(id=doc_id, page_content=text, metadata=metadata), distance))
+                if len(docs) == k:
+                    break
+            results.append(docs)
+        return results
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=FETCH_K, **kwargs):
+        return self.similarity_search_with_score_by_vectors([embedding], k, filter, fetch_k)[0]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, fetch_k=FETCH_K, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embeddings.embed_query(query), k, filter, fetch_k)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, fetch_k=FETCH_K, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter, fetch_k)]
+
+    def similarity_search(self, query, k=4, filter=None, fetch_k=FETCH_K, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, fetch_k)]
+
+    def _select_relevance_score_fn(self):
+        # Same mapping LangChain's FAISS uses for L2 distances
+        return self._euclidean_relevance_score_fn
+
+    def close(self):
+        self._conn.close()
+        self._indexes.clear()
+
+    def memory_bytes(self):
+        """
+        Index bytes held in process memory (memory-mapped files are paged in by the OS on demand).
+        Shards that are not memory-mapped count in full.
+        """
+        total = 0
+        for shard in self.shards.values():
+            total += shard.get("resident_bytes", 0)
+            if not (self.mmap and _mmap_flags(shard["kind"])):
+                total += os.path.getsize(os.path.join(self.path, shard["dir"], "index.faiss"))
+        return total
+
+    def footprint_bytes(self):
+        """
+        Upper bound of the memory the index takes once it has been searched: every index file
+        (mapped pages count once paged in), the in-memory extras (see memory_bytes) and the
+        SQLite store of chunk texts.
+        """
+        total = os.path.getsize(os.path.join(self.path, DOCS_FILE))
+        for shard in self.shards.values():
+            total += shard.get("resident_bytes", 0)
+            total += os.path.getsize(os.path.join(self.path, shard["dir"], "index.faiss"))
+        return total
+
+    # --- READ-ONLY ---
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("ShardedIndex is read-only; rebuild it with ShardedIndex.write")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Use ShardedIndex.write(path, ...) to create a ShardedIndex")
+
+
+def batch_search_with_score(vector_db, embeddings, k=4, filter=None, fetch_k=FETCH_K):
+    """
+    similarity_search_with_score for many query vectors in one FAISS search, for a ShardedIndex
+    or a LangChain FAISS store. Returns one [(Document, distance)] list per query.
+    """
+    if isinstance(vector_db, ShardedIndex):
+        return vector_db.similarity_search_with_score_by_vectors(embeddings, k, filter, fetch_k)
+
+    queries = np.asarray(embeddings, dtype="float32").reshape(len(embeddings), -1)
+    distances, positions = vector_db.index.search(queries, min(max(k, fetch_k) if filter else k,
+                                                               vector_db.index.ntotal))
+    results = []
+    for row_distances, row_positions in zip(distances, positions):
+        docs = []
+        for distance, position in zip(row_distances, row_positions):
+            if position < 0:
+                continue
+            doc = vector_db.docstore.search(vector_db.index_to_docstore_id[int(position)])
+            if not _matches(doc.metadata, filter):
+                continue
+            docs.append((doc, float(distance)))
+            if len(docs) == k:
+                break
+        results.append(docs)
+    return results
+
+
+def iter_documents(vector_db):
+    """
+    Yields every stored chunk (Document) of a ShardedIndex or LangChain FAISS store, in index order.
+    """
+    if isinstance(vector_db, ShardedIndex):
+        rows = vector_db._conn.execute("SELECT id, text, metadata FROM docs ORDER BY rowid")
+        for doc_id, text, metadata in rows:
+            yield Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+        return
+    for position in range(vector_db.index.ntotal):
+        yield vector_db.docstore.search(vector_db.index_to_docstore_id[position])